@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from common.metrics import BCRYPT_LATENCY, BCRYPT_QUEUE_WAIT
+
+# Konfiguracija
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")  # thread | process
+# jezgre se dijele izmedu uvicorn workera, svaki ima svoj pool
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1")))))
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", "64"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class HashQueueFull(Exception):
+    pass
+
+
+# Izvrsava se u workeru (thread ili proces), vraca i vremena za metrike
+def _run(method: str, *args):
+    started = time.time()
+    result = getattr(pwd_context, method)(*args)
+    return result, started, time.time()
+
+
+class HashingExecutor:
+    """Ograniceni pool za bcrypt da hashiranje ne blokira event loop."""
+
+    def __init__(self, kind: str = HASH_EXECUTOR, workers: int = HASH_WORKERS, queue_depth: int = HASH_QUEUE_DEPTH):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self._pool = None
+        self._in_flight = 0
+        self.stats = {
+            "completed": 0,
+            "rejected": 0,
+            "queue_wait_seconds_total": 0.0,
+            "queue_wait_seconds_max": 0.0,
+            "hash_seconds_total": 0.0,
+            "hash_seconds_max": 0.0,
+        }
+
+    # Pool se kreira lijeno da svaki uvicorn worker proces dobije svoj
+    def _get_pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._pool
+
+    async def _submit(self, method: str, *args):
+        if self._in_flight >= self.workers + self.queue_depth:
+            self.stats["rejected"] += 1
+            raise HashQueueFull()
+
+        self._in_flight += 1
+        submitted = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(self._get_pool(), _run, method, *args)
+        finally:
+            self._in_flight -= 1
+
+        wait = max(0.0, started - submitted)
+        took = finished - started
+        BCRYPT_QUEUE_WAIT.observe(wait, method)
+        BCRYPT_LATENCY.observe(took, method)
+        self.stats["completed"] += 1
+        self.stats["queue_wait_seconds_total"] += wait
+        self.stats["queue_wait_seconds_max"] = max(self.stats["queue_wait_seconds_max"], wait)
+        self.stats["hash_seconds_total"] += took
+        self.stats["hash_seconds_max"] = max(self.stats["hash_seconds_max"], took)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", plain_password, hashed_password)
+
+    def snapshot(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            **self.stats,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,28 +1,57 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr
-from motor.motor_asyncio import AsyncIOMotorClient
-from passlib.context import CryptContext
-from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import List, Optional
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from jose import jwt
+from datetime import datetime, timedelta, timezone
 from fastapi.openapi.utils import get_openapi
+from common.auth import SECRET_KEY, ALGORITHM, get_current_user, get_token_claims, revocation_sync, revocations
+from common.db import Lifespan, Mongo, create_health_router, mongo_unavailable
+from common.indexes import ensure_all_indexes
+from common.lookup import BatchLookup, find_by_ids, lookup_response, unique_ids
+from common.metrics import MetricsMiddleware, registry, router as metrics_router
+from common.revocation import REVOKED_TOKENS_COLLECTION, REVOKED_TOKENS_INDEXES, revoked_token_doc
+from hashing import HashingExecutor, HashQueueFull, HASH_RETRY_AFTER
+from throttle import THROTTLE_COLLECTION, THROTTLE_INDEXES, LoginThrottled, create_login_throttle
 
+import hashlib
 import os
+import secrets
+import uuid
 
 # Init
-app = FastAPI()
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
-client = AsyncIOMotorClient(MONGO_URL)
-db = client["voyageconnect"]
+mongo = Mongo()
+lifespan = Lifespan(mongo)
+app = FastAPI(lifespan=lifespan)
+db = mongo.db
 user_collection = db["users"]
+refresh_tokens = db["refresh_tokens"]
+revoked_tokens = db[REVOKED_TOKENS_COLLECTION]
 
-# Hasiranje
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+INDEXES = {
+    "users": [IndexModel([("email", ASCENDING)], unique=True)],
+    # {_id: sha256(token), family, email, expires_at, used_at, access_jti, access_expires_at}
+    "refresh_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("family", ASCENDING)]),
+    ],
+    REVOKED_TOKENS_COLLECTION: REVOKED_TOKENS_INDEXES,
+    THROTTLE_COLLECTION: THROTTLE_INDEXES,
+}
 
-# JWT konfiguracija
-SECRET_KEY = os.getenv("SECRET_KEY", "tajna123")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# Hasiranje (bcrypt ide u zaseban pool, ne na event loop)
+hasher = HashingExecutor()
+registry.register_snapshot("hashing", hasher.snapshot)
+
+# Ogranicenje pokusaja prijave (prije lookupa i bcrypta)
+login_throttle = create_login_throttle(db)
+registry.register_snapshot("login_throttle", login_throttle.snapshot)
+
+# JWT konfiguracija: kratki access token, dugi refresh token koji se rotira
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
 
 # Pydantic modeli
 class UserIn(BaseModel):
@@ -37,21 +66,114 @@ class UserOut(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    expires_in: int
+    refresh_token: str
+
+class UsersBatchIn(BaseModel):
+    emails: List[str]
+
+class RefreshIn(BaseModel):
+    refresh_token: str
+
+class LogoutIn(BaseModel):
+    refresh_token: Optional[str] = None
 
 # Helperi
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await hasher.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await hasher.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict, expires_delta: timedelta = None):
+def create_access_token(data: dict, expires_delta: timedelta = None, jti: str = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
+    # jti identificira token kod opoziva
+    to_encode.update({"exp": expire, "jti": jti or uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def hash_refresh_token(token: str) -> str:
+    # refresh token je slucajan (256 bita), pa je sha256 dovoljan; bcrypt nije potreban
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_tokens(email: str, family: str = None) -> dict:
+    """Novi access + refresh par; refresh token u bazi cuva samo hash."""
+    now = datetime.utcnow()
+    access_jti = uuid.uuid4().hex
+    access_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_token = secrets.token_urlsafe(32)
+    await refresh_tokens.insert_one({
+        "_id": hash_refresh_token(refresh_token),
+        "family": family or uuid.uuid4().hex,
+        "email": email,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "used_at": None,
+        "access_jti": access_jti,
+        "access_expires_at": now + access_expires,
+    })
+    return {
+        "access_token": create_access_token({"sub": email}, access_expires, jti=access_jti),
+        "token_type": "bearer",
+        "expires_in": int(access_expires.total_seconds()),
+        "refresh_token": refresh_token,
+    }
+
+async def revoke_access_token(jti: str, expires_at: datetime):
+    if not jti or expires_at <= datetime.utcnow():
+        return
+    doc = revoked_token_doc(jti, expires_at)
+    await revoked_tokens.update_one({"_id": jti}, {"$setOnInsert": doc}, upsert=True)
+    # ova instanca ne ceka sljedeci sync
+    revocations.add(jti, expires_at.replace(tzinfo=timezone.utc).timestamp())
+
+async def revoke_family(family: str):
+    """Brise sve refresh tokene obitelji i opoziva njihove jos zive access tokene."""
+    now = datetime.utcnow()
+    docs = await refresh_tokens.find(
+        {"family": family, "access_expires_at": {"$gt": now}}, {"access_jti": 1, "access_expires_at": 1}
+    ).to_list(None)
+    for doc in docs:
+        await revoke_access_token(doc["access_jti"], doc["access_expires_at"])
+    await refresh_tokens.delete_many({"family": family})
+
 # API
+app.add_middleware(MetricsMiddleware)
+app.include_router(metrics_router)
+app.include_router(create_health_router(mongo))
+app.add_exception_handler(ConnectionFailure, mongo_unavailable)
+
+@app.exception_handler(HashQueueFull)
+async def hash_queue_full_handler(request: Request, exc: HashQueueFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, try again later"},
+        headers={"Retry-After": str(HASH_RETRY_AFTER)},
+    )
+
+@app.exception_handler(LoginThrottled)
+async def login_throttled_handler(request: Request, exc: LoginThrottled):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many login attempts, try again later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@lifespan.on_startup
+async def create_indexes():
+    await ensure_all_indexes(db, INDEXES)
+
+@lifespan.on_startup
+async def start_revocation_sync():
+    await revocation_sync.start(db)
+
+@lifespan.on_shutdown
+async def stop_revocation_sync():
+    await revocation_sync.stop()
+
+@lifespan.on_shutdown
+def shutdown_hasher():
+    hasher.shutdown()
 
 @app.get("/")
 def read_root():
@@ -64,38 +186,70 @@ async def register(user: UserIn):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email već registriran")
 
-    hashed_pwd = hash_password(user.password)
+    hashed_pwd = await hash_password(user.password)
     user_doc = {**user.dict(), "password": hashed_pwd}
-    await user_collection.insert_one(user_doc)
+    try:
+        await user_collection.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email već registriran")
 
     return UserOut(username=user.username, email=user.email)
 
 @app.post("/login", response_model=Token, tags=["Auth"])
-async def login(user: UserIn):
+async def login(user: UserIn, request: Request):
+    await login_throttle.check(request, user.email)
     user_doc = await user_collection.find_one({"email": user.email})
-    if not user_doc or not verify_password(user.password, user_doc["password"]):
+    if not user_doc or not await verify_password(user.password, user_doc["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token_data = {"sub": user_doc["email"]}
-    token = create_access_token(token_data, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    return {"access_token": token, "token_type": "bearer"}
+    await login_throttle.succeeded(user.email)
+    return await issue_tokens(user_doc["email"])
 
-security = HTTPBearer()
+@app.post("/refresh", response_model=Token, tags=["Auth"])
+async def refresh(body: RefreshIn):
+    """Zamjenjuje refresh token novim parom, bez lozinke i bcrypta.
+
+    Svaki refresh token vrijedi jednom. Ponovna upotreba vec zamijenjenog
+    tokena znaci da ga ima jos netko, pa se opoziva cijela obitelj.
+    """
+    token_hash = hash_refresh_token(body.refresh_token)
+    now = datetime.utcnow()
+    doc = await refresh_tokens.find_one_and_update(
+        {"_id": token_hash, "used_at": None, "expires_at": {"$gt": now}},
+        {"$set": {"used_at": now}},
+    )
+    if doc is None:
+        reused = await refresh_tokens.find_one({"_id": token_hash, "used_at": {"$ne": None}}, {"family": 1})
+        if reused is not None:
+            await revoke_family(reused["family"])
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return await issue_tokens(doc["email"], doc["family"])
+
+@app.post("/logout", status_code=204, tags=["Auth"])
+async def logout(body: Optional[LogoutIn] = None, claims: dict = Depends(get_token_claims)):
+    """Opoziva trenutni access token (jti) i, ako je poslan, cijelu obitelj refresh tokena."""
+    if claims.get("exp"):
+        await revoke_access_token(claims.get("jti"), datetime.utcfromtimestamp(claims["exp"]))
+    if body is not None and body.refresh_token:
+        doc = await refresh_tokens.find_one(
+            {"_id": hash_refresh_token(body.refresh_token), "email": claims["sub"]}, {"family": 1}
+        )
+        if doc is not None:
+            await revoke_family(doc["family"])
+    return Response(status_code=204)
+
+@app.post("/users:batch", response_model=BatchLookup[UserOut], tags=["Auth"])
+async def get_users_batch(batch: UsersBatchIn, user_email: str = Depends(get_current_user)):
+    """Korisnici po emailu (created_by u ostalim servisima), bez lozinke; nepoznati su u missing."""
+    emails = unique_ids(batch.emails)
+    docs, missing = await find_by_ids(
+        user_collection, emails, {"_id": 0, "username": 1}, field="email", parse=str
+    )
+    return lookup_response(docs, missing, lambda doc: {"username": doc["username"], "email": doc["email"]})
 
 @app.get("/verify-token")
-async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_email = payload.get("sub")
-        if not user_email:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
-        return {"email": user_email}
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-@app.get("/health")
-async def health():
-    return {"status": "ok"}
+async def verify_token(user_email: str = Depends(get_current_user)):
+    return {"email": user_email}
 
 def custom_openapi():
     if app.openapi_schema:
@@ -118,7 +272,7 @@ def custom_openapi():
             if "security" not in openapi_schema["paths"][path][method]:
                 openapi_schema["paths"][path][method]["security"] = []
             # check ima li endpoint ima Depends(security)
-            if "verify-token" in path or "some-secured-endpoint" in path:
+            if "verify-token" in path or "logout" in path or "users:batch" in path:
                 openapi_schema["paths"][path][method]["security"] = [{"BearerAuth": []}]
     app.openapi_schema = openapi_schema
     return app.openapi_schema
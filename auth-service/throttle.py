@@ -0,0 +1,223 @@
+import ipaddress
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Konfiguracija
+LOGIN_THROTTLE = os.getenv("LOGIN_THROTTLE", "1") != "0"
+LOGIN_THROTTLE_BACKEND = os.getenv("LOGIN_THROTTLE_BACKEND", "mongo")  # mongo | local
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+LOGIN_EMAIL_BURST = float(os.getenv("LOGIN_EMAIL_BURST", "10"))
+LOGIN_EMAIL_PER_MINUTE = float(os.getenv("LOGIN_EMAIL_PER_MINUTE", "5"))
+LOGIN_IP_BURST = float(os.getenv("LOGIN_IP_BURST", "50"))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", "30"))
+# iza nginxa je request.client uvijek nginx; X-Real-IP postavlja nginx. Zaglavlje se
+# vjeruje samo ako zahtjev dolazi s jedne od ovih mreza (npr. "172.28.0.0/16,127.0.0.1")
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(net.strip(), strict=False)
+    for net in os.getenv("THROTTLE_TRUSTED_PROXIES", "").split(",") if net.strip()
+]
+
+THROTTLE_COLLECTION = "login_throttle"
+# {_id: kljuc, tokens, updated_at, expires_at}; zapis nestaje kad bi se bucket ionako napunio
+THROTTLE_INDEXES = [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)]
+
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in net for net in TRUSTED_PROXIES)
+
+
+class LoginThrottled(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Limit:
+    def __init__(self, name: str, burst: float, per_minute: float):
+        self.name = name
+        self.burst = burst
+        self.rate = per_minute / 60  # tokena u sekundi
+
+    def wait(self, tokens: float) -> float:
+        # koliko dugo do sljedeceg tokena
+        return (1 - tokens) / self.rate if self.rate > 0 else 60.0
+
+    def full_after(self, tokens: float) -> float:
+        return (self.burst - tokens) / self.rate if self.rate > 0 else 0.0
+
+
+EMAIL_LIMIT = Limit("email", LOGIN_EMAIL_BURST, LOGIN_EMAIL_PER_MINUTE)
+IP_LIMIT = Limit("ip", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE)
+
+
+class LocalBuckets:
+    """Token bucketi u memoriji procesa, LRU ograniceni na max_keys kljuceva.
+
+    Izbacuju se najdulje nekoristeni kljucevi; nakon toliko vremena bucket je
+    ionako (skoro) pun, pa izbacivanje ne mijenja odluke.
+    """
+
+    def __init__(self, max_keys: int = LOGIN_THROTTLE_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self.evictions = 0
+
+    def _tokens(self, key: str, limit: Limit, now: float) -> float:
+        entry = self._buckets.get(key)
+        if entry is None:
+            return limit.burst
+        tokens, updated_at = entry
+        return min(limit.burst, tokens + (now - updated_at) * limit.rate)
+
+    def _store(self, key: str, tokens: float, now: float):
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+    def take(self, key: str, limit: Limit) -> float:
+        """Uzima token; vraca 0 ako je dopusteno, inace sekunde do sljedeceg tokena."""
+        now = time.monotonic()
+        tokens = self._tokens(key, limit, now)
+        if tokens < 1:
+            self._store(key, tokens, now)
+            return limit.wait(tokens)
+        self._store(key, tokens - 1, now)
+        return 0.0
+
+    def refund(self, key: str, limit: Limit):
+        now = time.monotonic()
+        self._store(key, min(limit.burst, self._tokens(key, limit, now) + 1), now)
+
+    def drain(self, key: str):
+        # dijeljeni backend je odbio: sljedeci pokusaji se odbijaju vec lokalno
+        self._store(key, 0.0, time.monotonic())
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class MongoBuckets:
+    """Isti token bucket u kolekciji login_throttle, zajednicki za obje auth replike.
+
+    Dopunjavanje i oduzimanje tokena je jedan atomski update s pipelineom.
+    """
+
+    def __init__(self, db):
+        self.collection = db[THROTTLE_COLLECTION]
+
+    async def take(self, key: str, limit: Limit) -> float:
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [limit.burst, {"$add": [{"$ifNull": ["$tokens", limit.burst]},
+                                                    {"$multiply": [elapsed, limit.rate]}]}]}
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                }},
+                {"$set": {"expires_at": {"$add": [now, {"$multiply": [
+                    {"$divide": [{"$subtract": [limit.burst, "$tokens"]}, max(limit.rate, 1e-9)]}, 1000,
+                ]}]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return 0.0 if doc["allowed"] else limit.wait(doc["tokens"])
+
+    async def refund(self, key: str, limit: Limit):
+        await self.collection.update_one(
+            {"_id": key},
+            [{"$set": {"tokens": {"$min": [limit.burst, {"$add": ["$tokens", 1]}]}}}],
+        )
+
+
+class LoginThrottle:
+    """Ogranicava pokusaje prijave po emailu i po IP adresi.
+
+    Lokalni bucketi su prvi filter: odbijanje ne ide ni u bazu. Ako je
+    zadan dijeljeni backend, propusteni pokusaji se provjeravaju i u njemu,
+    pa obje replike dijele isto stanje. Uspjesna prijava vraca email token,
+    tako da se trose samo neuspjeli pokusaji.
+    """
+
+    def __init__(self, shared: Optional[MongoBuckets] = None, enabled: bool = LOGIN_THROTTLE):
+        self.enabled = enabled
+        self.local = LocalBuckets()
+        self.shared = shared
+        self.stats = {"allowed": 0, "throttled_email": 0, "throttled_ip": 0, "shared_errors": 0}
+
+    @staticmethod
+    def client_ip(request) -> str:
+        peer = request.client.host if request.client else "unknown"
+        if TRUSTED_PROXIES and is_trusted_proxy(peer):
+            forwarded = request.headers.get("x-real-ip")
+            if forwarded:
+                return forwarded
+        return peer
+
+    def _keys(self, request, email: str):
+        return [(f"ip:{self.client_ip(request)}", IP_LIMIT), (f"email:{email.lower()}", EMAIL_LIMIT)]
+
+    async def check(self, request, email: str):
+        if not self.enabled:
+            return
+        for key, limit in self._keys(request, email):
+            retry_after = self.local.take(key, limit)
+            if not retry_after and self.shared is not None:
+                try:
+                    retry_after = await self.shared.take(key, limit)
+                except PyMongoError:
+                    # bez dijeljenog stanja ostaje lokalni limit
+                    self.stats["shared_errors"] += 1
+                    logger.exception("Shared login throttle unavailable")
+                if retry_after:
+                    self.local.drain(key)
+            if retry_after:
+                self.stats[f"throttled_{limit.name}"] += 1
+                raise LoginThrottled(retry_after)
+        self.stats["allowed"] += 1
+
+    async def succeeded(self, email: str):
+        if not self.enabled:
+            return
+        key = f"email:{email.lower()}"
+        self.local.refund(key, EMAIL_LIMIT)
+        if self.shared is not None:
+            try:
+                await self.shared.refund(key, EMAIL_LIMIT)
+            except PyMongoError:
+                self.stats["shared_errors"] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": int(self.enabled),
+            "backend": LOGIN_THROTTLE_BACKEND if self.shared is not None else "local",
+            "local_keys": len(self.local),
+            "local_max_keys": self.local.max_keys,
+            "evictions": self.local.evictions,
+            **self.stats,
+        }
+
+
+def create_login_throttle(db) -> LoginThrottle:
+    if LOGIN_THROTTLE_BACKEND == "local":
+        return LoginThrottle()
+    return LoginThrottle(MongoBuckets(db))
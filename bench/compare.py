@@ -0,0 +1,44 @@
+"""Usporedba dva rezultata benchmarka: python bench/compare.py old.json new.json"""
+import json
+import sys
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def rows(old: dict, new: dict):
+    for service, result in new["services"].items():
+        before = old["services"].get(service, {}).get("workloads", {})
+        for name, metrics in result["workloads"].items():
+            if name not in before:
+                continue
+            yield f"{service}/{name}", before[name], metrics
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main(argv=None):
+    argv = argv or sys.argv[1:]
+    if len(argv) != 2:
+        sys.exit(__doc__)
+    old, new = load(argv[0]), load(argv[1])
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    header = f"{'workload':32}" + "".join(f"{m:>22}" for m in METRICS)
+    print(header)
+    print("-" * len(header))
+    for name, before, after in rows(old, new):
+        cells = "".join(f"{after[m]:>12} {change(before[m], after[m]):>9}" for m in METRICS)
+        errors = sum(after["errors"].values())
+        print(f"{name:32}{cells}" + (f"  ({errors} errors)" if errors else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import asyncio
+import importlib
+import itertools
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVICES = ("auth", "destination", "post", "comment", "forum")
+
+
+def load_service(name: str, mongo: str):
+    """Uvozi <name>-service/main.py u ovaj proces i vraca modul.
+
+    mongo je "mongomock" (in-memory, bez servera) ili MongoDB URL. Svaki servis
+    se pokrece u zasebnom procesu jer se svi moduli zovu main.
+    """
+    # pozadinski poslovi bi mijesali vlastiti promet u mjerenje
+    os.environ.setdefault("COUNTER_RECONCILE_INTERVAL", "0")
+    # sav promet dolazi s jedne adrese; login navala ne smije zavrsiti na IP limitu
+    os.environ.setdefault("LOGIN_IP_BURST", "1000000")
+    if mongo == "mongomock":
+        # mongomock nema tailable cursore, capped kolekcije ni change streamove
+        os.environ.setdefault("CACHE_INVALIDATION", "local")
+        os.environ.setdefault("EVENTS_CHANGE_STREAMS", "0")
+        os.environ.setdefault("LOGIN_THROTTLE_BACKEND", "local")
+        # mongomock bulk_write ne podrzava UpdateOne iz pymongo 4.x; aktivnost se samo broji u memoriji
+        os.environ.setdefault("ACTIVITY_FLUSH_INTERVAL", "0")
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+
+        motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+    else:
+        os.environ["MONGO_URL"] = mongo
+
+    sys.path[:0] = [str(ROOT / f"{name}-service"), str(ROOT)]
+    return importlib.import_module("main")
+
+
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class RssSampler:
+    """Najveci RSS procesa za vrijeme jednog workloada."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, current_rss())
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self):
+        self.peak = current_rss()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self.peak = max(self.peak, current_rss())
+
+
+def percentile(sorted_values, p: float) -> float:
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Workload:
+    """Jedan endpoint pod opterecenjem.
+
+    build(i) vraca kwargs za httpx request (url, params, json, headers) za i-ti zahtjev;
+    share skalira broj zahtjeva (npr. bcrypt endpointi rade manje ponavljanja).
+    """
+
+    def __init__(self, name: str, method: str, route: str, build, expect=(200,), share: float = 1.0):
+        self.name = name
+        self.method = method
+        self.route = route
+        self.build = build
+        self.expect = expect
+        self.share = share
+
+
+async def _drive(client, workload: Workload, start: int, total: int, concurrency: int, latencies=None):
+    # i tece dalje od warmupa da npr. register ne ponavlja iste emailove
+    counter = itertools.count(start)
+    errors = {}
+
+    async def worker():
+        while True:
+            i = next(counter)
+            if i >= start + total:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.request(workload.method, **workload.build(i))
+                status = response.status_code
+            except Exception as exc:
+                status = type(exc).__name__
+            if latencies is not None:
+                latencies.append(time.perf_counter() - started)
+            if status not in workload.expect:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return errors
+
+
+async def run_workload(client, workload: Workload, requests: int, concurrency: int, warmup: int) -> dict:
+    total = max(concurrency, int(requests * workload.share))
+    warmup = int(warmup * workload.share) if warmup else 0
+    if warmup:
+        await _drive(client, workload, 0, warmup, concurrency)
+
+    latencies = []
+    async with RssSampler() as rss:
+        started = time.perf_counter()
+        errors = await _drive(client, workload, warmup, total, concurrency, latencies)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "method": workload.method,
+        "route": workload.route,
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+    }
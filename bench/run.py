@@ -0,0 +1,122 @@
+"""Benchmark servisa in-process (httpx ASGITransport) nad mongomock-om ili lokalnim mongod-om.
+
+    python bench/run.py --service all --mongo mongomock --output bench-results.json
+    python bench/run.py --service forum --mongo mongodb://localhost:27017 --concurrency 64
+
+Rezultat je JSON s RPS, p50/p95/p99 i peak RSS po workloadu; dvije datoteke se
+usporeduju s bench/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from harness import ROOT, SERVICES, load_service, peak_rss, run_workload
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", default="all", choices=("all",) + SERVICES)
+    parser.add_argument("--mongo", default="mongomock",
+                        help='"mongomock" ili URL lokalnog mongod-a (kolekcije servisa se BRISU i pune iznova)')
+    parser.add_argument("--concurrency", type=int, default=16, help="broj istovremenih klijenata")
+    parser.add_argument("--requests", type=int, default=1000, help="broj zahtjeva po workloadu")
+    parser.add_argument("--warmup", type=int, default=50, help="zahtjevi prije mjerenja (ne ulaze u rezultat)")
+    parser.add_argument("--scale", type=float, default=1.0, help="mnozitelj kolicine seed podataka")
+    parser.add_argument("--workloads", default="", help="zarezom odvojena imena workloada (prazno = svi)")
+    parser.add_argument("--seed", type=int, default=42, help="seed generatora slucajnih podataka")
+    parser.add_argument("--output", default="bench-results.json")
+    return parser.parse_args(argv)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def bench_service(service: str, args) -> dict:
+    import httpx
+
+    module = load_service(service, args.mongo)
+    from seed import Sizes, seed_service
+    from workloads import WORKLOADS, Context
+
+    rng = random.Random(args.seed)
+    sizes = Sizes(args.scale)
+    started = time.perf_counter()
+    data = await seed_service(service, module.db, sizes, rng)
+    seed_seconds = time.perf_counter() - started
+
+    ctx = Context(data, rng, uuid.uuid4().hex[:8], sizes.users)
+    selected = {name for name in args.workloads.split(",") if name}
+    results = {}
+    app = module.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for workload in WORKLOADS[service](ctx):
+                if selected and workload.name not in selected:
+                    continue
+                print(f"[{service}] {workload.name} ...", file=sys.stderr, flush=True)
+                results[workload.name] = await run_workload(
+                    client, workload, args.requests, args.concurrency, args.warmup
+                )
+    return {
+        "seed": sizes.as_dict(),
+        "seed_seconds": round(seed_seconds, 2),
+        "peak_rss_mb": round(peak_rss() / 2**20, 1),
+        "workloads": results,
+    }
+
+
+def run_isolated(service: str, args) -> dict:
+    # svaki servis u svom procesu: svi se moduli zovu main, a RSS se mjeri po servisu
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, f"{service}.json")
+        argv = [sys.executable, __file__, "--service", service, "--output", output]
+        for name in ("mongo", "concurrency", "requests", "warmup", "scale", "workloads", "seed"):
+            argv += [f"--{name}", str(getattr(args, name))]
+        subprocess.run(argv, check=True)
+        with open(output) as f:
+            return json.load(f)["services"][service]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.service == "all":
+        services = {service: run_isolated(service, args) for service in SERVICES}
+    else:
+        services = {args.service: asyncio.run(bench_service(args.service, args))}
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "mongo": "mongomock" if args.mongo == "mongomock" else "mongod",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "scale": args.scale,
+        },
+        "services": services,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
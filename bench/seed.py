@@ -0,0 +1,203 @@
+"""Seed podaci za benchmark: puno destinacija, veliki forum topic, duboke niti komentara."""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from common.search import search_terms
+
+WORDS = (
+    "pula istra rovinj porec motovun opatija rijeka krk cres losinj zadar split hvar vis korcula dubrovnik "
+    "plaza more uvala otok stari grad muzej arena tvrdava vidikovac restoran konoba vino maslinovo ulje tartufi "
+    "setnja biciklizam ronjenje jedrenje kamp hotel apartman trajekt vozni red sezona ljeto proljece jesen "
+    "preporuka iskustvo savjet cijena guzva parking izlet obitelj djeca vodic karta ruta planinarenje"
+).split()
+SEED_PASSWORD = "benchpass"
+
+
+class Sizes:
+    def __init__(self, scale: float = 1.0):
+        n = lambda base: max(1, int(base * scale))
+        self.users = n(200)
+        self.destinations = n(5000)
+        self.posts = n(5000)
+        self.wide_comments = n(2000)  # top-level komentari na jednom postu
+        self.replies_per_comment = 3
+        self.thread_depth = min(n(200), 1000)  # lanac odgovora na drugom postu
+        self.topics = n(500)
+        self.big_topic_messages = n(20000)
+        self.messages_per_topic = 5
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def user_email(i: int) -> str:
+    return f"bench-user-{i}@example.com"
+
+
+def _text(rng, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+async def _insert(collection, docs, chunk: int = 1000):
+    for start in range(0, len(docs), chunk):
+        await collection.insert_many(docs[start:start + chunk], ordered=False)
+
+
+def _timeline(count: int):
+    # najnoviji dokument ima indeks 0, razmak od minute
+    now = datetime.utcnow()
+    return [now - timedelta(minutes=i) for i in range(count)]
+
+
+async def seed_users(db, sizes: Sizes, rng) -> dict:
+    from passlib.context import CryptContext
+
+    # isti hash za sve korisnike: seed bez tisuca bcrypt poziva
+    hashed = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(SEED_PASSWORD)
+    docs = [{"username": f"bench{i}", "email": user_email(i), "password": hashed} for i in range(sizes.users)]
+    await _insert(db.users, docs)
+    return {"emails": [d["email"] for d in docs]}
+
+
+async def seed_destinations(db, sizes: Sizes, rng) -> dict:
+    docs = []
+    for i, created_at in enumerate(_timeline(sizes.destinations)):
+        name = f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}"
+        description = _text(rng, rng.randint(80, 300))
+        docs.append({
+            "_id": ObjectId(),
+            "name": name,
+            "description": description,
+            "image_url": f"https://img.example.com/{i}.jpg",
+            "created_by": user_email(i % sizes.users),
+            "created_at": created_at,
+            "search_terms": search_terms(name, description),
+        })
+    await _insert(db.destinations, docs)
+    return {"destinations": docs}
+
+
+async def seed_posts(db, sizes: Sizes, rng, destinations) -> dict:
+    docs = []
+    for i, created_at in enumerate(_timeline(sizes.posts)):
+        # par popularnih destinacija ima vecinu postova
+        destination = destinations[min(int(rng.paretovariate(1.2)) - 1, len(destinations) - 1)]
+        title = _text(rng, 6).capitalize()
+        content = _text(rng, rng.randint(200, 800))
+        docs.append({
+            "_id": ObjectId(),
+            "title": title,
+            "content": content,
+            "image_url": None,
+            "destination_id": str(destination["_id"]),
+            "created_by": user_email(i % sizes.users),
+            "created_at": created_at,
+            "comment_count": 0,
+            "search_terms": search_terms(title, content),
+        })
+    await _insert(db.posts, docs)
+    return {"posts": docs}
+
+
+def _comment(post_id: str, parent, created_at, rng, users: int, i: int) -> dict:
+    ancestors = parent["ancestors"] + [str(parent["_id"])] if parent else []
+    return {
+        "_id": ObjectId(),
+        "post_id": post_id,
+        "parent_id": str(parent["_id"]) if parent else None,
+        "content": _text(rng, rng.randint(10, 60)),
+        "ancestors": ancestors,
+        "depth": len(ancestors),
+        "created_by": user_email(i % users),
+        "created_at": created_at,
+    }
+
+
+async def seed_comments(db, sizes: Sizes, rng, posts) -> dict:
+    wide_post, deep_post = str(posts[0]["_id"]), str(posts[1]["_id"])
+    start = datetime.utcnow() - timedelta(days=30)
+    docs = []
+
+    for i in range(sizes.wide_comments):
+        top = _comment(wide_post, None, start + timedelta(minutes=i), rng, sizes.users, i)
+        docs.append(top)
+        for r in range(sizes.replies_per_comment):
+            docs.append(_comment(wide_post, top, top["created_at"] + timedelta(seconds=r + 1), rng, sizes.users, r))
+
+    parent = None
+    for i in range(sizes.thread_depth):
+        parent = _comment(deep_post, parent, start + timedelta(seconds=i), rng, sizes.users, i)
+        docs.append(parent)
+
+    await _insert(db.comments, docs)
+    wide_count = len(docs) - sizes.thread_depth
+    await db.posts.update_one({"_id": posts[0]["_id"]}, {"$set": {"comment_count": wide_count}})
+    await db.posts.update_one({"_id": posts[1]["_id"]}, {"$set": {"comment_count": sizes.thread_depth}})
+    return {"wide_post": wide_post, "deep_post": deep_post, "deep_leaf": str(parent["_id"])}
+
+
+async def seed_forum(db, sizes: Sizes, rng) -> dict:
+    topics, messages = [], []
+    for i, created_at in enumerate(_timeline(sizes.topics)):
+        title = _text(rng, 5).capitalize()
+        description = _text(rng, rng.randint(20, 120))
+        count = sizes.big_topic_messages if i == 0 else sizes.messages_per_topic
+        topic = {
+            "_id": ObjectId(),
+            "title": title,
+            "description": description,
+            "created_by": user_email(i % sizes.users),
+            "created_at": created_at,
+            "message_count": count,
+            "last_activity_at": created_at + timedelta(seconds=count),
+            "search_terms": search_terms(title, description),
+        }
+        topics.append(topic)
+        for m in range(count):
+            messages.append({
+                "_id": ObjectId(),
+                "topic_id": str(topic["_id"]),
+                "content": _text(rng, rng.randint(5, 80)),
+                "created_by": user_email(m % sizes.users),
+                "created_at": created_at + timedelta(seconds=m + 1),
+            })
+    await _insert(db.forum_topics, topics)
+    await _insert(db.forum_messages, messages)
+    big_topic = topics[0]
+    return {
+        "topics": topics,
+        "big_topic": str(big_topic["_id"]),
+        "big_topic_messages": messages[:sizes.big_topic_messages],
+    }
+
+
+# kolekcije koje benchmark brise i puni za svaki servis
+COLLECTIONS = {
+    "auth": ("users",),
+    "destination": ("destinations",),
+    "post": ("destinations", "posts"),
+    "comment": ("posts", "comments"),
+    "forum": ("forum_topics", "forum_messages"),
+}
+
+
+async def seed_service(service: str, db, sizes: Sizes, rng) -> dict:
+    for name in COLLECTIONS[service]:
+        await db[name].drop()
+
+    data = {}
+    if service == "auth":
+        data.update(await seed_users(db, sizes, rng))
+    elif service == "destination":
+        data.update(await seed_destinations(db, sizes, rng))
+    elif service == "post":
+        data.update(await seed_destinations(db, sizes, rng))
+        data.update(await seed_posts(db, sizes, rng, data["destinations"]))
+    elif service == "comment":
+        data["posts"] = [{"_id": ObjectId(), "comment_count": 0} for _ in range(2)]
+        await _insert(db.posts, data["posts"])
+        data.update(await seed_comments(db, sizes, rng, data["posts"]))
+    elif service == "forum":
+        data.update(await seed_forum(db, sizes, rng))
+    return data
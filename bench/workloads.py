@@ -0,0 +1,139 @@
+"""Scenariji opterecenja po servisu. Svaki vraca listu Workload objekata nad seed podacima."""
+from datetime import datetime, timedelta
+
+from jose import jwt
+
+from common.auth import ALGORITHM, SECRET_KEY
+from common.pagination import encode_cursor
+from harness import Workload
+from seed import SEED_PASSWORD, WORDS, user_email
+
+
+def auth_workloads(ctx) -> list:
+    emails, tag = ctx.data["emails"], ctx.tag
+    return [
+        Workload("register", "POST", "/register", lambda i: {
+            "url": "/register",
+            "json": {"username": f"new{i}", "email": f"bench-{tag}-{i}@example.com", "password": SEED_PASSWORD},
+        }, share=0.1),
+        Workload("login", "POST", "/login", lambda i: {
+            "url": "/login",
+            "json": {"username": "bench", "email": emails[i % len(emails)], "password": SEED_PASSWORD},
+        }, share=0.1),
+        Workload("verify-token", "GET", "/verify-token", lambda i: {
+            "url": "/verify-token", "headers": ctx.auth(i),
+        }),
+    ]
+
+
+def destination_workloads(ctx) -> list:
+    docs = ctx.data["destinations"]
+    cursors = [encode_cursor(docs[ctx.rng.randrange(len(docs))], "created_at") for _ in range(100)]
+    # 80% citanja ide na 5% najnovijih destinacija
+    hot = docs[:max(1, len(docs) // 20)]
+    pick = lambda i: hot[i % len(hot)] if i % 5 else docs[(i * 7919) % len(docs)]
+    return [
+        Workload("list", "GET", "/destinations", lambda i: {"url": "/destinations", "params": {"limit": 20}}),
+        Workload("list-deep", "GET", "/destinations", lambda i: {
+            "url": "/destinations", "params": {"limit": 20, "cursor": cursors[i % len(cursors)]},
+        }),
+        Workload("get", "GET", "/destinations/{id}", lambda i: {"url": f"/destinations/{pick(i)['_id']}"}),
+        Workload("search", "GET", "/destinations/search", lambda i: {
+            "url": "/destinations/search", "params": {"q": ctx.word(i)},
+        }),
+        Workload("search-prefix", "GET", "/destinations/search", lambda i: {
+            "url": "/destinations/search", "params": {"q": ctx.word(i)[:3], "prefix": "true"},
+        }),
+        Workload("create", "POST", "/destinations", lambda i: {
+            "url": "/destinations", "headers": ctx.auth(i),
+            "json": {"name": f"Bench {i}", "description": ctx.text(40), "image_url": None},
+        }),
+    ]
+
+
+def post_workloads(ctx) -> list:
+    destinations, posts = ctx.data["destinations"], ctx.data["posts"]
+    popular = sorted({p["destination_id"] for p in posts[:200]})
+    return [
+        Workload("feed", "GET", "/feed", lambda i: {"url": "/feed", "params": {"limit": 20}}),
+        Workload("feed-destination", "GET", "/feed", lambda i: {
+            "url": "/feed", "params": {"limit": 20, "destination_id": popular[i % len(popular)]},
+        }),
+        Workload("list", "GET", "/posts", lambda i: {"url": "/posts", "params": {"limit": 20}}),
+        Workload("search", "GET", "/posts/search", lambda i: {"url": "/posts/search", "params": {"q": ctx.word(i)}}),
+        Workload("create", "POST", "/posts", lambda i: {
+            "url": "/posts", "headers": ctx.auth(i),
+            "json": {
+                "title": f"Bench {i}", "content": ctx.text(200),
+                "destination_id": str(destinations[i % len(destinations)]["_id"]),
+            },
+        }),
+    ]
+
+
+def comment_workloads(ctx) -> list:
+    wide, deep, leaf = ctx.data["wide_post"], ctx.data["deep_post"], ctx.data["deep_leaf"]
+    return [
+        Workload("list-wide", "GET", "/comments", lambda i: {"url": "/comments", "params": {"post_id": wide}}),
+        Workload("tree-wide", "GET", "/comments/tree", lambda i: {
+            "url": "/comments/tree", "params": {"post_id": wide, "max_depth": 3},
+        }),
+        Workload("tree-deep", "GET", "/comments/tree", lambda i: {
+            "url": "/comments/tree", "params": {"post_id": deep, "max_depth": 10},
+        }),
+        Workload("reply-deep", "POST", "/comments", lambda i: {
+            "url": "/comments", "headers": ctx.auth(i),
+            "json": {"post_id": deep, "parent_id": leaf, "content": ctx.text(20)},
+        }),
+    ]
+
+
+def forum_workloads(ctx) -> list:
+    topics, big = ctx.data["topics"], ctx.data["big_topic"]
+    messages = ctx.data["big_topic_messages"]
+    cursors = [encode_cursor(messages[ctx.rng.randrange(len(messages))], "created_at") for _ in range(100)]
+    return [
+        Workload("topics-activity", "GET", "/topics", lambda i: {"url": "/topics", "params": {"sort": "activity"}}),
+        Workload("topic", "GET", "/topics/{id}", lambda i: {"url": f"/topics/{topics[i % len(topics)]['_id']}"}),
+        Workload("messages-big", "GET", "/messages", lambda i: {
+            "url": "/messages", "params": {"topic_id": big, "limit": 50},
+        }),
+        Workload("messages-big-deep", "GET", "/messages", lambda i: {
+            "url": "/messages", "params": {"topic_id": big, "limit": 50, "cursor": cursors[i % len(cursors)]},
+        }),
+        Workload("post-message", "POST", "/messages", lambda i: {
+            "url": "/messages", "headers": ctx.auth(i), "json": {"topic_id": big, "content": ctx.text(30)},
+        }),
+    ]
+
+
+WORKLOADS = {
+    "auth": auth_workloads,
+    "destination": destination_workloads,
+    "post": post_workloads,
+    "comment": comment_workloads,
+    "forum": forum_workloads,
+}
+
+
+class Context:
+    """Seed podaci i pomocnici koje koriste builderi zahtjeva."""
+
+    def __init__(self, data: dict, rng, tag: str, users: int):
+        self.data = data
+        self.rng = rng
+        self.tag = tag
+        expire = datetime.utcnow() + timedelta(hours=6)
+        self._headers = [
+            {"Authorization": "Bearer " + jwt.encode({"sub": user_email(i), "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)}
+            for i in range(min(users, 50))
+        ]
+
+    def auth(self, i: int) -> dict:
+        return self._headers[i % len(self._headers)]
+
+    def word(self, i: int) -> str:
+        return WORDS[i % len(WORDS)]
+
+    def text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
@@ -1,24 +1,65 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, Path
+from fastapi import FastAPI, Depends, HTTPException, Query, Path, Request
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from motor.motor_asyncio import AsyncIOMotorClient
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import ConnectionFailure
 import os
 
-app = FastAPI()
+from common.activity import ActivityTracker
+from common.auth import get_current_user, revocation_sync
+from common.cascade import (
+    CASCADE_COLLECTION, CASCADE_INDEXES, CascadeWorker, cascade_task, descendants_filter, enqueue_cascade,
+)
+from common.batch import BatchDeleteIn, BatchResult, check_batch_size, delete_owned_many, insert_many_results
+from common.counters import bump_counter, bump_counters, count_by, reconcile_counters
+from common.db import Lifespan, Mongo, create_health_router, mongo_unavailable
+from common.fields import FieldSelection, field_selector, sparse_model
+from common.indexes import ensure_all_indexes
+from common.lookup import find_by_ids
+from common.metrics import MetricsMiddleware, registry, router as metrics_router
+from common.pagination import Page, PageParams, fetch_page
+from common.repository import delete_owned, parse_object_id, update_owned
+from common.responses import dump_json, json_bytes_response, model_projection, page_response
+from common.streaming import NDJSON_RESPONSES, ndjson_response, wants_ndjson
+from common.tasks import PeriodicTask, run_in_background
+from common.versions import bump_versions, conditional, scope
+from tree import backfill_paths, build_tree, reply_path
+
+mongo = Mongo()
+lifespan = Lifespan(mongo)
+app = FastAPI(lifespan=lifespan)
 
 # Konfiguracija
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
-SECRET_KEY = os.getenv("SECRET_KEY", "velikitajnikljuckojitrebapromjenit")
-ALGORITHM = "HS256"
+TREE_MAX_DEPTH = int(os.getenv("COMMENT_TREE_MAX_DEPTH", "10"))
+TREE_MAX_NODES = int(os.getenv("COMMENT_TREE_MAX_NODES", "2000"))
+COUNTER_RECONCILE_INTERVAL = float(os.getenv("COUNTER_RECONCILE_INTERVAL", "3600"))
+
+db = mongo.db
+
+INDEXES = {
+    "comments": [
+        IndexModel([("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("post_id", ASCENDING), ("parent_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        # materijalizirani put: ancestors = [root_id, ..., parent_id]
+        IndexModel([("ancestors", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    CASCADE_COLLECTION: CASCADE_INDEXES,
+}
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.voyageconnect
+# odgovori na obrisane komentare (cijelo podstablo) brisu se u pozadini
+cascade_worker = CascadeWorker(db)
+registry.register_snapshot("cascade", cascade_worker.snapshot)
+# komentari dizu aktivnost destinacije posta (trending u destination-service)
+activity = ActivityTracker(db)
+registry.register_snapshot("activity", activity.snapshot)
 
-security = HTTPBearer()
+app.add_middleware(MetricsMiddleware)
+app.include_router(metrics_router)
+app.include_router(create_health_router(mongo))
+app.add_exception_handler(ConnectionFailure, mongo_unavailable)
 
 # Pydantic modeli
 class CommentIn(BaseModel):
@@ -31,17 +72,84 @@ class CommentOut(CommentIn):
     created_by: str
     created_at: datetime
 
-# JWT tokn
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_email: str = payload.get("sub")
-        if user_email is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth token")
-        return user_email
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth token")
+class CommentNode(CommentOut):
+    depth: int = 0
+    replies: List["CommentNode"] = []
+    more_replies: int = 0  # broj odgovora koji nisu stali u replies_limit
+
+CommentNode.model_rebuild()
+
+class CommentTree(Page[CommentNode]):
+    truncated: bool = False  # potomaka je vise od COMMENT_TREE_MAX_NODES; dohvatiti dublje razine preko parent_id
+
+TREE_PROJECTION = model_projection(CommentNode)
+CommentFields = sparse_model(CommentOut)
+select_comment_fields = field_selector(CommentOut, summary=("post_id", "parent_id", "created_by", "created_at"))
+
+def new_comment_doc(comment: CommentIn, ancestors: List[str], user_email: str) -> dict:
+    doc = comment.dict()
+    doc.update({
+        "ancestors": ancestors,
+        "depth": len(ancestors),
+        "created_by": user_email,
+        "created_at": datetime.utcnow()
+    })
+    return doc
+
+def replies_cascade(comment: dict) -> dict:
+    return {
+        "collection": "comments",
+        "filter": descendants_filter(str(comment["_id"]), comment["post_id"]),
+        "counter": {"collection": "posts", "id": comment["post_id"], "field": "comment_count"},
+        "scopes": [scope("comments", comment["post_id"]), "posts"],
+    }
+
+# posts.comment_count odrzava comment-service (on pise komentare)
+async def reconcile_comment_counts():
+    if await reconcile_counters(db.posts, db.comments, "post_id", "comment_count"):
+        await bump_versions(db, "posts")
+
+# run_at_start popunjava brojace na starim postovima
+counter_reconciler = PeriodicTask(
+    reconcile_comment_counts, COUNTER_RECONCILE_INTERVAL, "reconcile-comment-counts", run_at_start=True
+)
+
+@lifespan.on_startup
+async def create_indexes():
+    await ensure_all_indexes(db, INDEXES)
+    run_in_background(backfill_paths(db.comments), "backfill-comment-paths")
+
+@lifespan.on_startup
+async def start_background_tasks():
+    counter_reconciler.start()
+
+@lifespan.on_shutdown
+async def stop_background_tasks():
+    await counter_reconciler.stop()
+
+@lifespan.on_startup
+async def start_revocation_sync():
+    await revocation_sync.start(db)
+
+@lifespan.on_shutdown
+async def stop_revocation_sync():
+    await revocation_sync.stop()
+
+@lifespan.on_startup
+async def start_cascade_worker():
+    cascade_worker.start()
+
+@lifespan.on_shutdown
+async def stop_cascade_worker():
+    await cascade_worker.stop()
+
+@lifespan.on_startup
+async def start_activity():
+    activity.start()
+
+@lifespan.on_shutdown
+async def stop_activity():
+    await activity.stop()
 
 @app.get("/")
 def read_root():
@@ -50,23 +158,149 @@ def read_root():
 
 @app.post("/comments", response_model=CommentOut, tags=["Comments"])
 async def create_comment(comment: CommentIn, user_email: str = Depends(get_current_user)):
-    new_comment = comment.dict()
-    new_comment.update({
-        "created_by": user_email,
-        "created_at": datetime.utcnow()
-    })
+    parent = None
+    if comment.parent_id:
+        parent = await db.comments.find_one(
+            {"_id": parse_object_id(comment.parent_id), "post_id": comment.post_id},
+            {"ancestors": 1, "parent_id": 1},
+        )
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent comment not found")
+    new_comment = new_comment_doc(comment, await reply_path(db.comments, parent), user_email)
     result = await db.comments.insert_one(new_comment)
     new_comment["id"] = str(result.inserted_id)
+    # isti upis vraca i destination_id posta, bez dodatnog upita
+    post = await bump_counter(db.posts, comment.post_id, "comment_count", 1, projection={"destination_id": 1})
+    activity.bump("destinations", post and post.get("destination_id"), "comment")
+    # comment_count je dio posta, pa se mijenja i verzija postova
+    await bump_versions(db, scope("comments", comment.post_id), "posts")
     return new_comment
 
-@app.get("/comments", response_model=List[CommentOut], tags=["Comments"])
-async def get_comments(post_id: str = Query(...)):
-    cursor = db.comments.find({"post_id": post_id})
-    comments = []
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        comments.append(CommentOut(**doc))
-    return comments
+@app.post("/comments:batch", response_model=BatchResult, tags=["Comments"])
+async def create_comments_batch(comments: List[CommentIn], user_email: str = Depends(get_current_user)):
+    check_batch_size(comments)
+    results = [None] * len(comments)
+
+    # svi roditelji jednim upitom
+    parent_ids = {}
+    for index, comment in enumerate(comments):
+        if comment.parent_id:
+            try:
+                parent_ids[index] = ObjectId(comment.parent_id)
+            except InvalidId:
+                results[index] = {"index": index, "status": "invalid", "detail": "Invalid parent_id"}
+    parents = {}
+    if parent_ids:
+        cursor = db.comments.find({"_id": {"$in": list(set(parent_ids.values()))}}, {"post_id": 1, "ancestors": 1, "parent_id": 1})
+        parents = {doc["_id"]: doc async for doc in cursor}
+
+    docs, indexes = [], []
+    known_paths = {}
+    for index, comment in enumerate(comments):
+        if results[index] is not None:
+            continue
+        parent = None
+        if index in parent_ids:
+            parent = parents.get(parent_ids[index])
+            if not parent or parent["post_id"] != comment.post_id:
+                results[index] = {"index": index, "status": "not_found", "detail": "Parent comment not found"}
+                continue
+        docs.append(new_comment_doc(comment, await reply_path(db.comments, parent, known_paths), user_email))
+        indexes.append(index)
+
+    created = []
+    for doc, result in zip(docs, await insert_many_results(db.comments, docs, indexes)):
+        results[result["index"]] = result
+        if result["status"] == "created":
+            created.append(doc)
+    counts = count_by(created, "post_id")
+    await bump_counters(db.posts, counts, "comment_count")
+    if created:
+        # destinacije postova jednim upitom, aktivnost kao kod pojedinacnog komentara
+        found, _ = await find_by_ids(db.posts, list(counts), {"destination_id": 1})
+        destinations = {str(post["_id"]): post.get("destination_id") for post in found}
+        for doc in created:
+            activity.bump("destinations", destinations.get(doc["post_id"]), "comment")
+        await bump_versions(db, "posts", *(scope("comments", doc["post_id"]) for doc in created))
+    return {"results": results}
+
+@app.delete("/comments:batch", response_model=BatchResult, tags=["Comments"])
+async def delete_comments_batch(batch: BatchDeleteIn, user_email: str = Depends(get_current_user)):
+    check_batch_size(batch.ids)
+    results, deleted = await delete_owned_many(db.comments, batch.ids, user_email, {"post_id": 1})
+    if deleted:
+        await db[CASCADE_COLLECTION].insert_many([cascade_task(**replies_cascade(doc)) for doc in deleted])
+        cascade_worker.kick()
+    await bump_counters(db.posts, count_by(deleted, "post_id", -1), "comment_count")
+    if deleted:
+        await bump_versions(db, "posts", *(scope("comments", doc["post_id"]) for doc in deleted))
+    return {"results": results}
+
+@app.get("/comments", response_model=Page[CommentFields], tags=["Comments"], responses=NDJSON_RESPONSES)
+async def get_comments(
+    request: Request,
+    post_id: str = Query(...),
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(select_comment_fields),
+    ndjson: bool = Depends(wants_ndjson),
+):
+    validators = await conditional(request, db, scope("comments", post_id))
+    if validators.not_modified:
+        return validators.not_modified_response()
+    query = {"post_id": post_id}
+    if ndjson:
+        return ndjson_response(db.comments, query, page.cursor, descending=False, projection=fields.projection(),
+                               transform=fields.serialize, headers=validators.headers)
+    docs, next_cursor = await fetch_page(
+        db.comments, query, page, descending=False, projection=fields.projection("created_at")
+    )
+    return page_response(docs, next_cursor, fields.serialize, headers=validators.headers)
+
+@app.get("/comments/tree", response_model=CommentTree, tags=["Comments"])
+async def get_comment_tree(
+    request: Request,
+    post_id: str = Query(...),
+    parent_id: Optional[str] = Query(None, description="Stranica odgovora na ovaj komentar; bez njega top-level komentari"),
+    max_depth: int = Query(3, ge=0, le=TREE_MAX_DEPTH),
+    replies_limit: int = Query(10, ge=0, le=100),
+    page: PageParams = Depends(),
+):
+    validators = await conditional(request, db, scope("comments", post_id))
+    if validators.not_modified:
+        return validators.not_modified_response()
+    level_docs, next_cursor = await fetch_page(
+        db.comments, {"post_id": post_id, "parent_id": parent_id}, page, descending=False, projection=TREE_PROJECTION
+    )
+    descendants = []
+    boundary_counts = {}
+    truncated = False
+    level_ids = [str(doc["_id"]) for doc in level_docs]
+    level_depth = level_docs[0].get("depth", 0) if level_docs else 0
+    if level_docs and max_depth > 0:
+        cursor = db.comments.find({
+            "ancestors": {"$in": level_ids},
+            "depth": {"$lte": level_depth + max_depth},
+        }, TREE_PROJECTION).sort([("created_at", ASCENDING), ("_id", ASCENDING)]).limit(TREE_MAX_NODES + 1)
+        descendants = await cursor.to_list(TREE_MAX_NODES + 1)
+        # jedan vise od limita: klijent mora znati da stablo nije potpuno
+        truncated = len(descendants) > TREE_MAX_NODES
+        del descendants[TREE_MAX_NODES:]
+    if level_docs:
+        # cvorovi na granici dubine: samo broj djece, bez dohvacanja njihovih podstabala
+        boundary_counts = {
+            row["_id"]: row["count"]
+            async for row in db.comments.aggregate([
+                {"$match": {"ancestors": {"$in": level_ids}, "depth": level_depth + max_depth + 1}},
+                {"$group": {"_id": "$parent_id", "count": {"$sum": 1}}},
+            ])
+        }
+
+    body = dump_json({
+        "items": build_tree(level_docs, descendants, replies_limit, boundary_counts),
+        "next_cursor": next_cursor,
+        "truncated": truncated,
+    })
+    return json_bytes_response(body, headers=validators.headers)
 
 @app.patch("/comments/{id}", response_model=CommentOut, tags=["Comments"])
 async def update_comment(
@@ -75,18 +309,14 @@ async def update_comment(
     user_email: str = Depends(get_current_user)
 ):
     update_data = comment_update.dict(exclude_unset=True)
+    # polozaj u stablu (ancestors) je fiksiran kod kreiranja
+    update_data.pop("post_id", None)
+    update_data.pop("parent_id", None)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    comment = await db.comments.find_one({"_id": ObjectId(id)})
-    if not comment:
-        raise HTTPException(status_code=404, detail="Comment not found")
-    if comment["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to edit this comment")
-
-    await db.comments.update_one({"_id": ObjectId(id)}, {"$set": update_data})
-    updated_comment = await db.comments.find_one({"_id": ObjectId(id)})
-    updated_comment["id"] = str(updated_comment["_id"])
+    updated_comment = await update_owned(db.comments, id, user_email, {"$set": update_data}, "comment")
+    await bump_versions(db, scope("comments", updated_comment["post_id"]))
     return updated_comment
 
 @app.delete("/comments/{id}", status_code=204, tags=["Comments"])
@@ -94,15 +324,9 @@ async def delete_comment(
     id: str = Path(...),
     user_email: str = Depends(get_current_user)
 ):
-    comment = await db.comments.find_one({"_id": ObjectId(id)})
-    if not comment:
-        raise HTTPException(status_code=404, detail="Comment not found")
-    if comment["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
-
-    await db.comments.delete_one({"_id": ObjectId(id)})
+    comment = await delete_owned(db.comments, id, user_email, "comment")
+    await enqueue_cascade(db, **replies_cascade(comment))
+    cascade_worker.kick()
+    await bump_counter(db.posts, comment["post_id"], "comment_count", -1)
+    await bump_versions(db, scope("comments", comment["post_id"]), "posts")
     return
-
-@app.get("/health")
-def health():
-    return {"status": "ok"} 
\ No newline at end of file
@@ -0,0 +1,116 @@
+import logging
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# zastita od petlji u parent_id lancu starih komentara
+PATH_MAX_DEPTH = 1000
+
+
+def _node(doc: dict) -> dict:
+    doc["id"] = str(doc.pop("_id"))
+    doc["replies"] = []
+    doc["more_replies"] = 0
+    doc.setdefault("parent_id", None)
+    doc.setdefault("depth", 0)
+    return doc
+
+
+def build_tree(level_docs: List[dict], descendants: List[dict], replies_limit: int,
+               boundary_counts: Optional[Dict[str, int]] = None) -> List[dict]:
+    """Slaze stablo u O(n).
+
+    descendants moraju biti sortirani po (created_at, _id) pa je roditelj uvijek
+    obraden prije djeteta. Odgovori preko replies_limit se samo broje, a njihova
+    podstabla se preskacu (klijent ih dohvaca preko parent_id + cursor).
+    boundary_counts (id -> broj djece) su odgovori cvorova na granici max_depth.
+    """
+    nodes = {}
+    roots = []
+    for doc in level_docs:
+        node = _node(doc)
+        nodes[node["id"]] = node
+        roots.append(node)
+
+    for doc in descendants:
+        parent = nodes.get(doc.get("parent_id"))
+        if parent is None:
+            continue
+        if len(parent["replies"]) >= replies_limit:
+            parent["more_replies"] += 1
+            continue
+        node = _node(doc)
+        nodes[node["id"]] = node
+        parent["replies"].append(node)
+
+    for parent_id, count in (boundary_counts or {}).items():
+        parent = nodes.get(parent_id)
+        if parent is not None:
+            parent["more_replies"] += count
+
+    return roots
+
+
+async def ancestors_of(collection, comment_id: str, known: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """ancestors komentara comment_id ([root, ..., roditelj]).
+
+    Komentari nastali prije materijaliziranog puta nemaju ancestors, pa se put
+    slaze penjanjem po parent_id. known pamti vec izracunate puteve (id -> ancestors).
+    Obrisani roditelj se tretira kao korijen: potomci ga i dalje imaju u ancestors.
+    """
+    known = {} if known is None else known
+    chain = []  # id-jevi bez poznatog puta, od comment_id prema korijenu
+    current = comment_id
+    while current not in known and len(chain) < PATH_MAX_DEPTH:
+        try:
+            doc = await collection.find_one({"_id": ObjectId(current)}, {"parent_id": 1, "ancestors": 1})
+        except InvalidId:
+            doc = None
+        if doc is None or "ancestors" in doc or doc.get("parent_id") is None:
+            known[current] = doc["ancestors"] if doc is not None and "ancestors" in doc else []
+            break
+        chain.append(current)
+        current = doc["parent_id"]
+    path = known.setdefault(current, [])
+    for child in reversed(chain):
+        path = path + [current]
+        known[child] = path
+        current = child
+    return known[comment_id]
+
+
+async def reply_path(collection, parent: Optional[dict], known: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """ancestors novog komentara s roditeljem parent (None za top-level)."""
+    if parent is None:
+        return []
+    parent_id = str(parent["_id"])
+    if "ancestors" in parent:
+        return parent["ancestors"] + [parent_id]
+    return await ancestors_of(collection, parent_id, known) + [parent_id]
+
+
+async def backfill_paths(collection, batch_size: int = 500):
+    """Popunjava ancestors/depth na komentarima nastalima prije materijaliziranog puta."""
+    known = {}
+    filled = 0
+    while True:
+        docs = await collection.find({"ancestors": {"$exists": False}}, {"parent_id": 1}).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        ops = []
+        for doc in docs:
+            parent_id = doc.get("parent_id")
+            ancestors = await ancestors_of(collection, parent_id, known) + [parent_id] if parent_id else []
+            known[str(doc["_id"])] = ancestors
+            ops.append(UpdateOne(
+                {"_id": doc["_id"], "ancestors": {"$exists": False}},
+                {"$set": {"ancestors": ancestors, "depth": len(ancestors)}},
+            ))
+        filled += (await collection.bulk_write(ops, ordered=False)).modified_count
+        known.clear()  # memorija ostaje ogranicena na jednu seriju
+    if filled:
+        logger.info("Backfilled ancestors on %d comments", filled)
@@ -0,0 +1 @@
+# Zajednicki kod koji koriste svi mikroservisi
@@ -0,0 +1,189 @@
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from bson import ObjectId
+from pydantic import BaseModel
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+
+from common.responses import dump_json, json_bytes_response
+from common.tasks import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# Konfiguracija
+ACTIVITY_HALF_LIFE_HOURS = float(os.getenv("ACTIVITY_HALF_LIFE_HOURS", "24"))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "5"))
+ACTIVITY_TOPK_INTERVAL = float(os.getenv("ACTIVITY_TOPK_INTERVAL", "30"))
+ACTIVITY_TOPK_SIZE = int(os.getenv("ACTIVITY_TOPK_SIZE", "20"))
+ACTIVITY_MAX_PENDING = int(os.getenv("ACTIVITY_MAX_PENDING", "100000"))
+
+# tezine dogadaja
+ACTIVITY_WEIGHTS = {"view": 1.0, "comment": 2.0, "message": 3.0, "post": 5.0}
+
+ACTIVITY_COLLECTION = "activity_scores"
+# {_id: "<kind>:<epoch>:<entity_id>", kind, entity_id, epoch, score, expires_at}
+ACTIVITY_INDEXES = [
+    IndexModel([("kind", ASCENDING), ("epoch", ASCENDING), ("score", DESCENDING)]),
+    IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+]
+
+# Score s eksponencijalnim padom (forward decay): dogadaj u trenutku t vrijedi
+# w * 2^((t - L) / H) za landmark L, pa se novi dogadaji samo pribrajaju ($inc)
+# i poredak unutar epohe je vec poredak po trenutnom scoreu. Landmark se pomice
+# svakih EPOCH_HALF_LIVES poluzivota da brojevi ne rastu neograniceno.
+HALF_LIFE = ACTIVITY_HALF_LIFE_HOURS * 3600
+EPOCH_HALF_LIVES = 8
+EPOCH_SECONDS = HALF_LIFE * EPOCH_HALF_LIVES
+
+T = TypeVar("T")
+
+
+class Ranked(BaseModel, Generic[T]):
+    items: List[T]
+
+
+def current_epoch(now: float) -> int:
+    return int(now // EPOCH_SECONDS)
+
+
+def forward_weight(weight: float, now: float, epoch: int) -> float:
+    return weight * 2 ** ((now - epoch * EPOCH_SECONDS) / HALF_LIFE)
+
+
+def decayed(score: float, epoch: int, now: float) -> float:
+    # vrijednost score-a epohe preracunata na trenutak now
+    return score * 2 ** ((epoch * EPOCH_SECONDS - now) / HALF_LIFE)
+
+
+class ActivityTracker:
+    """Brojaci aktivnosti u memoriji, upisuju se u Mongo u pozadini (write-behind).
+
+    bump() je cisti CPU: zahtjev ne ceka bazu. Svakih ACTIVITY_FLUSH_INTERVAL
+    sekundi nakupljeni iznosi idu jednim bulk_write-om ($inc). Pad procesa
+    gubi najvise zadnji interval, sto je za rang listu prihvatljivo.
+    """
+
+    def __init__(self, db, interval: float = ACTIVITY_FLUSH_INTERVAL, max_pending: int = ACTIVITY_MAX_PENDING):
+        self.collection = db[ACTIVITY_COLLECTION]
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[str, int, str], float] = {}
+        self.stats = {"bumps": 0, "dropped": 0, "flushes": 0, "flushed_keys": 0, "flush_failures": 0}
+        self._task = PeriodicTask(self.flush, interval, "activity-flush")
+
+    def bump(self, kind: str, entity_id: Optional[str], event: str):
+        """Poziva se samo za entitete za koje se zna da postoje (procitani ili upisani dokument)."""
+        if not entity_id or not ObjectId.is_valid(entity_id):
+            return
+        now = time.time()
+        epoch = current_epoch(now)
+        key = (kind, epoch, str(entity_id))
+        if key not in self._pending and len(self._pending) >= self.max_pending:
+            self.stats["dropped"] += 1  # memorija je ogranicena; do flusha se novi kljucevi ne pamte
+            return
+        self._pending[key] = self._pending.get(key, 0.0) + forward_weight(ACTIVITY_WEIGHTS[event], now, epoch)
+        self.stats["bumps"] += 1
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        ops = [
+            UpdateOne(
+                {"_id": f"{kind}:{epoch}:{entity_id}"},
+                {
+                    "$inc": {"score": amount},
+                    "$setOnInsert": {
+                        "kind": kind, "entity_id": entity_id, "epoch": epoch,
+                        # nakon dvije epohe zapis vise ne ulazi u rang listu
+                        "expires_at": datetime.utcfromtimestamp((epoch + 2) * EPOCH_SECONDS),
+                    },
+                },
+                upsert=True,
+            )
+            for (kind, epoch, entity_id), amount in pending.items()
+        ]
+        try:
+            await self.collection.bulk_write(ops, ordered=False)
+        except Exception:
+            self.stats["flush_failures"] += 1
+            # vraca se u pending za sljedeci pokusaj (u granicama max_pending)
+            for key, amount in pending.items():
+                if key in self._pending or len(self._pending) < self.max_pending:
+                    self._pending[key] = self._pending.get(key, 0.0) + amount
+            raise
+        self.stats["flushes"] += 1
+        self.stats["flushed_keys"] += len(ops)
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+        if self.interval <= 0:
+            return  # flush je iskljucen
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final activity flush failed")
+
+    def snapshot(self) -> dict:
+        return {"pending": len(self._pending), **self.stats}
+
+
+class TopK:
+    """Unaprijed izracunata rang lista jedne vrste (npr. destinations), spremljena kao bytes.
+
+    hydrate(ids) vraca dokumente za prikaz (redoslijed ids), a score se dodaje
+    svakoj stavci. Endpoint samo vraca zadnji izracun.
+    """
+
+    def __init__(self, db, kind: str, hydrate: Callable[[List[str]], Awaitable[List[dict]]],
+                 size: int = ACTIVITY_TOPK_SIZE, interval: float = ACTIVITY_TOPK_INTERVAL):
+        self.collection = db[ACTIVITY_COLLECTION]
+        self.kind = kind
+        self.hydrate = hydrate
+        self.size = size
+        self.interval = interval
+        self.body = dump_json({"items": []})
+        self.stats = {"refreshes": 0, "items": 0}
+        self._task = PeriodicTask(self.refresh, interval, f"topk-{kind}", run_at_start=True)
+
+    async def refresh(self):
+        now = time.time()
+        epoch = current_epoch(now)
+        scores: Dict[str, float] = {}
+        # trenutna i prethodna epoha; kandidata vise od size jer se zbrajaju preko granice epohe
+        for e in (epoch, epoch - 1):
+            cursor = self.collection.find(
+                {"kind": self.kind, "epoch": e}, {"entity_id": 1, "score": 1}
+            ).sort("score", DESCENDING).limit(self.size * 4)
+            async for doc in cursor:
+                scores[doc["entity_id"]] = scores.get(doc["entity_id"], 0.0) + decayed(doc["score"], e, now)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.size]
+        items = await self.hydrate([entity_id for entity_id, _ in ranked]) if ranked else []
+        by_id = dict(ranked)
+        for item in items:
+            item["score"] = round(by_id.get(item["id"], 0.0), 3)
+        self.body = dump_json({"items": items})
+        self.stats["refreshes"] += 1
+        self.stats["items"] = len(items)
+
+    def response(self):
+        # lista se mijenja najkasnije nakon interval sekundi
+        max_age = max(1, math.ceil(self.interval))
+        return json_bytes_response(self.body, headers={"Cache-Control": f"public, max-age={max_age}"})
+
+    def start(self):
+        self._task.start()
+
+    async def stop(self):
+        await self._task.stop()
+
+    def snapshot(self) -> dict:
+        return dict(self.stats)
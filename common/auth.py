@@ -0,0 +1,106 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import JWTError, jwk, jwt
+
+from common.metrics import JWT_DECODE_LATENCY, registry
+from common.revocation import RevocationList, RevocationSync
+
+# JWT konfiguracija (ista za sve servise)
+SECRET_KEY = os.getenv("SECRET_KEY", "velikitajnikljuckojitrebapromjenit")
+ALGORITHM = "HS256"
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+security = HTTPBearer()
+
+
+class TokenVerifier:
+    """Verificira JWT i pamti rezultat (LRU + TTL, najkasnije do exp).
+
+    Opoziv (jti) se provjerava i na cache hitu, ali samo u memoriji: listu
+    opozvanih tokena puni RevocationSync u pozadini.
+    """
+
+    def __init__(self, secret: str = SECRET_KEY, algorithm: str = ALGORITHM,
+                 max_size: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL,
+                 revocations: RevocationList = None):
+        # kljuc se parsira samo jednom
+        self.key = jwk.construct(secret, algorithm)
+        self.revocations = revocations if revocations is not None else RevocationList()
+        self.algorithm = algorithm
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache = OrderedDict()  # sha256(token) -> (claims, expires_at)
+        self.stats = {"hits": 0, "misses": 0, "failures": 0, "evictions": 0, "revoked": 0}
+
+    def _decode(self, token: str) -> dict:
+        started = time.perf_counter()
+        try:
+            claims = jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except JWTError:
+            self.stats["failures"] += 1
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        finally:
+            JWT_DECODE_LATENCY.observe(time.perf_counter() - started)
+        if not claims.get("sub"):
+            self.stats["failures"] += 1
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
+        return claims
+
+    def verify(self, token: str) -> dict:
+        claims = self._claims(token)
+        if self.revocations.is_revoked(claims.get("jti")):
+            self.stats["revoked"] += 1
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        return claims
+
+    def _claims(self, token: str) -> dict:
+        now = time.time()
+        cache_key = hashlib.sha256(token.encode()).digest()
+
+        entry = self._cache.get(cache_key)
+        if entry is not None:
+            claims, expires_at = entry
+            if now < expires_at:
+                self._cache.move_to_end(cache_key)
+                self.stats["hits"] += 1
+                return claims
+            del self._cache[cache_key]
+            self.stats["evictions"] += 1
+
+        self.stats["misses"] += 1
+        claims = self._decode(token)
+
+        expires_at = now + self.ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        if self.max_size > 0 and expires_at > now:
+            self._cache[cache_key] = (claims, expires_at)
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+        return claims
+
+    def snapshot(self) -> dict:
+        return {"cache_size": len(self._cache), "cache_max_size": self.max_size, **self.stats}
+
+
+revocations = RevocationList()
+revocation_sync = RevocationSync(revocations)
+verifier = TokenVerifier(revocations=revocations)
+registry.register_snapshot("token_cache", verifier.snapshot)
+registry.register_snapshot("revocations", revocation_sync.snapshot)
+
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    return verifier.verify(credentials.credentials)
+
+
+async def get_current_user(claims: dict = Depends(get_token_claims)) -> str:
+    return claims["sub"]
+
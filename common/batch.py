@@ -0,0 +1,106 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+
+# Konfiguracija
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+# koliko dugo oznaka brisanja vrijedi ako zahtjev padne izmedu oznacavanja i brisanja
+DELETE_MARK_SECONDS = int(os.getenv("BATCH_DELETE_MARK_SECONDS", "60"))
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: str  # created | deleted | not_found | forbidden | invalid | error
+    detail: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    results: List[BatchItemResult]
+
+
+class BatchDeleteIn(BaseModel):
+    ids: List[str]
+
+
+def check_batch_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+
+
+async def insert_many_results(collection, docs: List[dict], indexes: List[int]) -> List[dict]:
+    """insert_many(ordered=False) i rezultat po stavci; indexes su pozicije docs u originalnom zahtjevu."""
+    if not docs:
+        return []
+    failed = {}
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        failed = {err["index"]: err.get("errmsg") for err in exc.details.get("writeErrors", [])}
+
+    # insert_many dodjeljuje _id svakom dokumentu prije slanja
+    results = []
+    for pos, (doc, index) in enumerate(zip(docs, indexes)):
+        if pos in failed:
+            results.append({"index": index, "status": "error", "detail": failed[pos]})
+        else:
+            results.append({"index": index, "id": str(doc["_id"]), "status": "created"})
+    return results
+
+
+async def delete_owned_many(collection, ids: List[str], owner: str, projection: Optional[dict] = None):
+    """Brise dokumente vlasnika; vraca (rezultati po stavci, obrisani dokumenti).
+
+    Tri upita za cijelu seriju: dokumenti se prvo oznace tokenom ovog zahtjeva,
+    zatim procitaju i obrisu po tom tokenu. Dokument oznacava samo jedan
+    zahtjev, pa dvije istovremene serije s istim id-jevima ne umanjuju brojace
+    roditelja dvaput.
+    """
+    results = [None] * len(ids)
+    wanted = {}
+    for index, id in enumerate(ids):
+        try:
+            wanted.setdefault(ObjectId(id), []).append(index)
+        except (InvalidId, TypeError):
+            results[index] = {"index": index, "id": id, "status": "invalid", "detail": "Invalid ID format"}
+
+    owned = []
+    if wanted:
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+        await collection.update_many(
+            {
+                "_id": {"$in": list(wanted)},
+                "created_by": owner,
+                # oznaka zahtjeva koji je pao prije brisanja ne blokira zauvijek
+                "$or": [{"deleting": {"$exists": False}},
+                        {"deleting.at": {"$lt": now - timedelta(seconds=DELETE_MARK_SECONDS)}}],
+            },
+            {"$set": {"deleting": {"token": token, "at": now}}},
+        )
+        owned = await collection.find(
+            {"deleting.token": token}, {"created_by": 1, **(projection or {})}
+        ).to_list(None)
+        if owned:
+            await collection.delete_many({"deleting.token": token})
+
+    status_by_id = {doc["_id"]: "deleted" for doc in owned}
+    remaining = [oid for oid in wanted if oid not in status_by_id]
+    if remaining:
+        # tudi dokument je forbidden; vlastiti je upravo obrisao drugi zahtjev
+        async for doc in collection.find({"_id": {"$in": remaining}}, {"created_by": 1}):
+            if doc.get("created_by") != owner:
+                status_by_id[doc["_id"]] = "forbidden"
+    for oid, indexes in wanted.items():
+        for index in indexes:
+            results[index] = {"index": index, "id": str(oid), "status": status_by_id.get(oid, "not_found")}
+    return results, owned
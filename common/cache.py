@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_ID = f"{os.getenv('INSTANCE', 'unknown')}-{uuid.uuid4().hex[:8]}"
+
+
+class TTLCache:
+    """In-process LRU cache s TTL-om po unosu."""
+
+    def __init__(self, max_size: int = 1000, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        # raste kod svake invalidacije; set() s starijom generacijom se ignorira
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if time.monotonic() < expires_at:
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+                return value
+            del self._data[key]
+        self.stats["misses"] += 1
+        return None
+
+    def peek(self, key) -> bool:
+        """Postoji li vazeci unos, bez utjecaja na statistiku i LRU redoslijed."""
+        entry = self._data.get(key)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def set(self, key, value, generation: int = None):
+        if generation is not None and generation != self.generation:
+            return  # u meduvremenu je bila invalidacija, vrijednost je mozda zastarjela
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, keys=(), prefixes=()):
+        self.generation += 1
+        for key in keys:
+            if self._data.pop(key, None) is not None:
+                self.stats["invalidations"] += 1
+        if prefixes:
+            prefixes = tuple(prefixes)
+            for key in [k for k in self._data if k.startswith(prefixes)]:
+                del self._data[key]
+                self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
+
+    def snapshot(self) -> dict:
+        return {"size": len(self._data), "max_size": self.max_size, "ttl": self.ttl, **self.stats}
+
+
+class LocalInvalidationChannel:
+    """Invalidacija samo unutar procesa (za testove i jednu instancu)."""
+
+    def __init__(self):
+        self._handlers = {}
+
+    def subscribe(self, channel: str, handler):
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _dispatch(self, channel: str, keys, prefixes):
+        for handler in self._handlers.get(channel, []):
+            handler(keys, prefixes)
+
+    async def publish(self, channel: str, keys=(), prefixes=()):
+        self._dispatch(channel, list(keys), list(prefixes))
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class MongoInvalidationChannel(LocalInvalidationChannel):
+    """Invalidacija izmedu replika preko capped kolekcije i tailable cursora.
+
+    Poruke su idempotentne, pa ponovno primanje starih poruka nije problem;
+    a ako se koja izgubi (npr. zbog razlike u satovima) unos ionako istekne po TTL-u.
+    """
+
+    def __init__(self, db, collection_name: str = "cache_invalidations", size: int = 1024 * 1024):
+        super().__init__()
+        self.db = db
+        self.collection_name = collection_name
+        self.size = size
+        self._task = None
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    async def publish(self, channel: str, keys=(), prefixes=()):
+        keys, prefixes = list(keys), list(prefixes)
+        # lokalno odmah, ostalima preko kolekcije
+        self._dispatch(channel, keys, prefixes)
+        try:
+            await self.collection.insert_one({
+                "channel": channel, "keys": keys, "prefixes": prefixes, "origin": INSTANCE_ID,
+            })
+        except PyMongoError:
+            logger.exception("Failed to publish cache invalidation")
+
+    async def start(self):
+        try:
+            await self.db.create_collection(self.collection_name, capped=True, size=self.size)
+        except CollectionInvalid:
+            pass  # vec postoji (ili ju je upravo kreirala druga replika)
+        self._task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _tail(self):
+        last_id = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=5))
+        while True:
+            try:
+                cursor = self.collection.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for msg in cursor:
+                        last_id = msg["_id"]
+                        if msg.get("origin") != INSTANCE_ID:
+                            self._dispatch(msg.get("channel"), msg.get("keys", []), msg.get("prefixes", []))
+                    await asyncio.sleep(0.1)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError:
+                logger.exception("Cache invalidation tail failed, retrying")
+            await asyncio.sleep(1)
+
+
+def create_invalidation_channel(db):
+    backend = os.getenv("CACHE_INVALIDATION", "mongo")
+    if backend == "local":
+        return LocalInvalidationChannel()
+    return MongoInvalidationChannel(db)
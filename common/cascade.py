@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+
+from common.tasks import PeriodicTask, run_in_background
+from common.versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+# Konfiguracija
+CASCADE_BATCH_SIZE = int(os.getenv("CASCADE_BATCH_SIZE", "500"))
+CASCADE_LEASE_SECONDS = int(os.getenv("CASCADE_LEASE_SECONDS", "60"))
+CASCADE_INTERVAL = float(os.getenv("CASCADE_INTERVAL", "10"))
+
+CASCADE_COLLECTION = "cascade_tasks"
+# {_id, collection, filter, counter, scopes, status: pending|done, owner, lease_until,
+#  attempts, deleted, created_at, updated_at, finished_at}
+CASCADE_INDEXES = [
+    IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)]),
+    # zavrseni zadaci ostaju tjedan dana radi uvida, zatim ih brise TTL
+    IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+]
+
+
+def descendants_filter(comment_id: str, post_id: Optional[str] = None) -> dict:
+    """Svi potomci komentara.
+
+    Komentari nastali prije materijaliziranog puta imaju samo parent_id (dok ih
+    ne popuni backfill u comment-serviceu), pa se traze i po njemu; s post_id
+    ta grana koristi indeks (post_id, parent_id, ...).
+    """
+    direct = {"parent_id": comment_id}
+    if post_id is not None:
+        direct = {"post_id": post_id, **direct}
+    return {"$or": [{"ancestors": comment_id}, direct]}
+
+
+# Veze dijete -> roditelj koje sweeper provjerava: (kolekcija, polje, roditeljska kolekcija, filter za kaskadu)
+RELATIONS = [
+    ("comments", "post_id", "posts", lambda value: {"post_id": value}),
+    ("comments", "parent_id", "comments", descendants_filter),
+    ("forum_messages", "topic_id", "forum_topics", lambda value: {"topic_id": value}),
+]
+
+
+def cascade_task(collection: str, filter: dict, counter: Optional[dict] = None, scopes: List[str] = ()) -> dict:
+    now = datetime.utcnow()
+    return {
+        "collection": collection,
+        "filter": filter,
+        "counter": counter,
+        "scopes": list(scopes),
+        "status": "pending",
+        "owner": None,
+        "lease_until": now,
+        "attempts": 0,
+        "deleted": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def enqueue_cascade(db, collection: str, filter: dict, counter: Optional[dict] = None,
+                          scopes: List[str] = ()) -> ObjectId:
+    """Zapisuje zadatak brisanja ovisnih dokumenata; samo brisanje radi CascadeWorker.
+
+    counter ({collection, id, field}) se smanjuje za broj obrisanih dokumenata,
+    a scopes dobivaju novu verziju nakon svake serije.
+    """
+    result = await db[CASCADE_COLLECTION].insert_one(cascade_task(collection, filter, counter, scopes))
+    return result.inserted_id
+
+
+class CascadeWorker:
+    """Brise ovisne dokumente u serijama od CASCADE_BATCH_SIZE.
+
+    Zadatak se preuzima leaseom, pa ga istovremeno obraduje samo jedna replika;
+    ako replika padne usred posla, lease istekne i zadatak nastavlja druga (ili
+    ista nakon restarta). Brisanje je idempotentno: svaki prolaz brise ono sto
+    jos odgovara filteru.
+    """
+
+    def __init__(self, db, batch_size: int = CASCADE_BATCH_SIZE, lease_seconds: int = CASCADE_LEASE_SECONDS,
+                 interval: float = CASCADE_INTERVAL):
+        self.db = db
+        self.tasks = db[CASCADE_COLLECTION]
+        self.batch_size = batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.owner = f"{os.getenv('INSTANCE', 'local')}-{uuid.uuid4().hex[:8]}"
+        self.stats = {"tasks_done": 0, "deleted": 0, "batches": 0, "lease_lost": 0}
+        self._periodic = PeriodicTask(self.drain, interval, "cascade-worker", run_at_start=True)
+        self._draining = None
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await self.tasks.find_one_and_update(
+            {"status": "pending", "lease_until": {"$lte": now}},
+            {"$set": {"owner": self.owner, "lease_until": now + self.lease, "updated_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("lease_until", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _batch(self, task: dict) -> int:
+        collection = self.db[task["collection"]]
+        ids = [doc["_id"] for doc in await collection.find(task["filter"], {"_id": 1}).limit(self.batch_size)
+               .to_list(self.batch_size)]
+        if not ids:
+            return 0
+        deleted = (await collection.delete_many({"_id": {"$in": ids}})).deleted_count
+        counter = task.get("counter")
+        if counter and deleted:
+            try:
+                await self.db[counter["collection"]].update_one(
+                    {"_id": ObjectId(counter["id"])}, {"$inc": {counter["field"]: -deleted}}
+                )
+            except InvalidId:
+                pass
+        if task.get("scopes"):
+            await bump_versions(self.db, *task["scopes"])
+        return deleted
+
+    async def _run(self, task: dict):
+        while True:
+            deleted = await self._batch(task)
+            self.stats["batches"] += 1
+            self.stats["deleted"] += deleted
+            now = datetime.utcnow()
+            update = {"$inc": {"deleted": deleted}, "$set": {"lease_until": now + self.lease, "updated_at": now}}
+            if not deleted:
+                update["$set"].update({"status": "done", "finished_at": now})
+            # lease se produljuje samo ako je zadatak jos nas
+            renewed = await self.tasks.update_one({"_id": task["_id"], "owner": self.owner}, update)
+            if not renewed.matched_count:
+                self.stats["lease_lost"] += 1
+                logger.warning("Lost lease on cascade task %s", task["_id"])
+                return
+            if not deleted:
+                self.stats["tasks_done"] += 1
+                return
+            await asyncio.sleep(0)  # serije ne smiju zauzeti event loop
+
+    async def drain(self):
+        """Obraduje sve zadatke koji su slobodni (novi ili s isteklim leaseom)."""
+        while True:
+            task = await self._claim()
+            if task is None:
+                return
+            await self._run(task)
+
+    def kick(self):
+        # poziva ga delete handler: posao krece odmah, a ne tek na sljedeci interval
+        if self._draining is None or self._draining.done():
+            self._draining = run_in_background(self.drain(), "cascade-drain")
+
+    def start(self):
+        self._periodic.start()
+
+    async def stop(self):
+        await self._periodic.stop()
+        if self._draining is not None and not self._draining.done():
+            self._draining.cancel()
+
+    def snapshot(self) -> dict:
+        return dict(self.stats)
+
+
+async def _missing_parents(db, child: str, field: str, parent: str) -> List[str]:
+    values = [row["_id"] async for row in db[child].aggregate([
+        {"$match": {field: {"$ne": None}}},
+        {"$group": {"_id": f"${field}"}},
+    ], allowDiskUse=True)]
+    missing = []
+    for start in range(0, len(values), CASCADE_BATCH_SIZE):
+        chunk = values[start:start + CASCADE_BATCH_SIZE]
+        oids = {}
+        for value in chunk:
+            try:
+                oids[ObjectId(value)] = value
+            except (InvalidId, TypeError):
+                missing.append(value)  # neispravan id nikad nema roditelja
+        existing = {doc["_id"] async for doc in db[parent].find({"_id": {"$in": list(oids)}}, {"_id": 1})}
+        missing += [value for oid, value in oids.items() if oid not in existing]
+    return missing
+
+
+async def sweep_orphans(db, dry_run: bool = False) -> dict:
+    """Jednokratno trazi sirocad (djecu ciji roditelj vise ne postoji) i za njih zapisuje kaskadne zadatke."""
+    found = {}
+    for child, field, parent, cascade_filter in RELATIONS:
+        missing = await _missing_parents(db, child, field, parent)
+        found[f"{child}.{field}"] = len(missing)
+        if dry_run:
+            continue
+        if missing:
+            await db[CASCADE_COLLECTION].insert_many([cascade_task(child, cascade_filter(value)) for value in missing])
+    return found
+
+
+async def _sweep_main(mongo_url: str, dry_run: bool, run: bool):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    db = AsyncIOMotorClient(mongo_url)["voyageconnect"]
+    print(await sweep_orphans(db, dry_run))
+    if run and not dry_run:
+        # bez --run zadatke pokupe workeri u post/comment/forum servisima
+        worker = CascadeWorker(db)
+        await worker.drain()
+        print(worker.stats)
+
+
+if __name__ == "__main__":
+    # python -m common.cascade [--dry-run] [--run]
+    parser = argparse.ArgumentParser(description="Pronalazi sirocad u comments/forum_messages")
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--dry-run", action="store_true", help="samo prebroji, ne zapisuj zadatke")
+    parser.add_argument("--run", action="store_true", help="odmah i obrisi (inace to rade servisi)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_sweep_main(args.mongo_url, args.dry_run, args.run))
@@ -0,0 +1,110 @@
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# roditelj s djetetom mladim od ovoga se preskace: njegov $inc mozda jos nije upisan
+RECONCILE_GRACE_SECONDS = float(os.getenv("COUNTER_RECONCILE_GRACE_SECONDS", "5"))
+
+
+def _parent_update(field: str, delta: int, touch: Optional[str], at: Optional[datetime]) -> dict:
+    update = {"$inc": {field: delta}}
+    if touch and at is not None:
+        update["$max"] = {touch: at}
+    return update
+
+
+async def bump_counter(collection, parent_id: str, field: str, delta: int,
+                       touch: Optional[str] = None, at: Optional[datetime] = None,
+                       projection: Optional[dict] = None) -> Optional[dict]:
+    """Atomski $inc brojaca na roditelju (i $max za last_activity polje).
+
+    S projection se radi find_one_and_update i vraca roditelj (npr. za
+    destination_id), bez dodatnog upita.
+    """
+    try:
+        oid = ObjectId(parent_id)
+    except (InvalidId, TypeError):
+        return None
+    update = _parent_update(field, delta, touch, at)
+    if projection is not None:
+        return await collection.find_one_and_update({"_id": oid}, update, projection=projection)
+    await collection.update_one({"_id": oid}, update)
+    return None
+
+
+async def bump_counters(collection, deltas: Dict[str, int], field: str,
+                        touch: Optional[str] = None, at: Optional[datetime] = None):
+    """Isto kao bump_counter, ali za vise roditelja jednim bulk_write-om."""
+    ops = []
+    for parent_id, delta in deltas.items():
+        try:
+            oid = ObjectId(parent_id)
+        except (InvalidId, TypeError):
+            continue
+        if delta:
+            ops.append(UpdateOne({"_id": oid}, _parent_update(field, delta, touch, at)))
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+
+
+def count_by(docs, key: str, sign: int = 1) -> Dict[str, int]:
+    return {parent: sign * n for parent, n in Counter(doc[key] for doc in docs).items()}
+
+
+async def reconcile_counters(parent_collection, child_collection, parent_field: str, count_field: str,
+                             touch: Optional[str] = None) -> int:
+    """Popravlja drift: preracunava brojace iz child kolekcije i zapisuje samo razlike.
+
+    Agregacija preko cijele kolekcije samo bira kandidate; za svakog kandidata
+    djeca se prebroje ponovno nakon citanja roditelja, a update je uvjetovan
+    procitanom vrijednoscu. Dijete koje je uslo u recount, a njegov $inc jos
+    nije, podiglo bi brojac previse, pa se kandidati s djetetom novijim od
+    RECONCILE_GRACE_SECONDS preskacu do sljedeceg prolaza. To suzava, ali ne
+    zatvara prozor (npr. za brisanja nema vremena); preostali drift popravlja
+    sljedeci prolaz.
+    """
+    group = {"_id": f"${parent_field}", "count": {"$sum": 1}, "last": {"$max": "$created_at"}}
+    stats = {}
+    async for row in child_collection.aggregate([{"$group": group}]):
+        stats[row["_id"]] = row
+
+    projection = {count_field: 1, "created_at": 1}
+    if touch:
+        projection[touch] = 1
+
+    def wanted_for(parent: dict, row: dict) -> dict:
+        wanted = {count_field: row.get("count", 0)}
+        if touch:
+            candidates = [v for v in (parent.get("created_at"), row.get("last")) if v is not None]
+            wanted[touch] = max(candidates) if candidates else None
+        return wanted
+
+    repaired = 0
+    async for parent in parent_collection.find({}, projection):
+        parent_id = str(parent["_id"])
+        current = {field: parent.get(field) for field in (count_field, touch) if field}
+        if current == wanted_for(parent, stats.get(parent_id, {})):
+            continue
+        # kandidat: ponovno brojanje s podacima novijim od procitanog roditelja
+        rows = await child_collection.aggregate([{"$match": {parent_field: parent_id}}, {"$group": group}]).to_list(1)
+        row = rows[0] if rows else {}
+        if row.get("last") and row["last"] > datetime.utcnow() - timedelta(seconds=RECONCILE_GRACE_SECONDS):
+            continue
+        wanted = wanted_for(parent, row)
+        if current == wanted:
+            continue
+        # odmah, dok je brojanje svjeze; filter na procitane vrijednosti: ako se u meduvremenu promijenilo, preskacemo
+        result = await parent_collection.update_one({"_id": parent["_id"], **current}, {"$set": wanted})
+        repaired += result.modified_count
+
+    if repaired:
+        logger.info("Reconciled %s on %d %s documents", count_field, repaired, parent_collection.name)
+    return repaired
@@ -0,0 +1,212 @@
+import asyncio
+import inspect
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import motor.motor_asyncio
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from pymongo.database import Database
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+from common.metrics import mongo_listener
+
+logger = logging.getLogger(__name__)
+
+# Konfiguracija
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
+MONGO_DB = os.getenv("MONGO_DB", "voyageconnect")
+# pool je po procesu: ukupno spajanja = WEB_CONCURRENCY * MONGO_MAX_POOL_SIZE po instanci
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))  # 0: bez ogranicenja
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))  # 0: ceka se neograniceno
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0"))  # 0: bez ogranicenja
+MONGO_STARTUP_TIMEOUT = float(os.getenv("MONGO_STARTUP_TIMEOUT", "60"))
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "1"))
+UNAVAILABLE_RETRY_AFTER = int(os.getenv("MONGO_UNAVAILABLE_RETRY_AFTER", "1"))
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+    }
+    # 0 znaci pymongo default (bez ogranicenja), pa se opcija ni ne salje
+    for name, value in (
+        ("maxIdleTimeMS", MONGO_MAX_IDLE_TIME_MS),
+        ("waitQueueTimeoutMS", MONGO_WAIT_QUEUE_TIMEOUT_MS),
+        ("socketTimeoutMS", MONGO_SOCKET_TIMEOUT_MS),
+    ):
+        if value > 0:
+            options[name] = value
+    return options
+
+
+class LazyCollection:
+    """Kolekcija koja se razrjesava tek kod upotrebe, kad klijent vec postoji."""
+
+    def __init__(self, mongo: "Mongo", name: str):
+        self._mongo = mongo
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._mongo.database[self._name], attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+class LazyDatabase:
+    """Baza za module-level kod (db["posts"], db.comments, MediaStore(db), ...).
+
+    Pristup kolekciji ne stvara klijent; metode baze (command, create_collection)
+    se prosljeduju pravoj bazi.
+    """
+
+    def __init__(self, mongo: "Mongo"):
+        self._mongo = mongo
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        return LazyCollection(self._mongo, name)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or hasattr(Database, name):
+            return getattr(self._mongo.database, name)
+        return LazyCollection(self._mongo, name)
+
+    def resolve(self):
+        return self._mongo.database
+
+
+def resolve_database(db):
+    # Motor tipovi (npr. GridFS bucket) traze pravu bazu
+    return db.resolve() if isinstance(db, LazyDatabase) else db
+
+
+class Mongo:
+    """Motor klijent jednog procesa.
+
+    Klijent se stvara kod prve upotrebe, a to je lifespan workera: svaki
+    uvicorn worker ima svoj pool i svoj event loop, nista se ne nasljeduje
+    od roditeljskog procesa.
+    """
+
+    def __init__(self, url: str = MONGO_URL, name: str = MONGO_DB):
+        self.url = url
+        self.name = name
+        self.db = LazyDatabase(self)
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = motor.motor_asyncio.AsyncIOMotorClient(
+                self.url, event_listeners=[mongo_listener], **client_options()
+            )
+        return self._client
+
+    @property
+    def database(self):
+        return self.client[self.name]
+
+    async def ping(self):
+        await self.database.command("ping")
+
+    async def warm_up(self, timeout: float = MONGO_STARTUP_TIMEOUT):
+        # prvo spajanje prije prvog zahtjeva; Mongo se u composeu moze dizati sporije od servisa
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                await self.ping()
+                return
+            except ConnectionFailure:
+                if time.monotonic() >= deadline:
+                    raise
+                logger.warning("MongoDB at %s not reachable yet, retrying", self.url)
+                await asyncio.sleep(1)
+
+    async def ready(self, timeout: float = READY_TIMEOUT) -> bool:
+        try:
+            await asyncio.wait_for(self.ping(), timeout)
+            return True
+        except (asyncio.TimeoutError, PyMongoError):
+            return False
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class Lifespan:
+    """Startup/shutdown hookovi servisa (umjesto @app.on_event).
+
+    Klijent se otvara i zagrijava prije svih startup hookova (indeksi, sync,
+    workeri), a zatvara nakon svih shutdown hookova.
+    """
+
+    def __init__(self, mongo: Mongo):
+        self.mongo = mongo
+        self._startup = []
+        self._shutdown = []
+
+    def on_startup(self, hook):
+        self._startup.append(hook)
+        return hook
+
+    def on_shutdown(self, hook):
+        self._shutdown.append(hook)
+        return hook
+
+    @staticmethod
+    async def _run(hook):
+        result = hook()
+        if inspect.isawaitable(result):
+            await result
+
+    @asynccontextmanager
+    async def __call__(self, app):
+        await self.mongo.warm_up()
+        for hook in self._startup:
+            await self._run(hook)
+        try:
+            yield
+        finally:
+            for hook in self._shutdown:
+                await self._run(hook)
+            self.mongo.close()
+
+
+async def mongo_unavailable(request, exc: ConnectionFailure):
+    # 503 umjesto 500: nginx zahtjev prebacuje na backup instancu (proxy_next_upstream http_503)
+    logger.warning("MongoDB unavailable: %s", exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database unavailable"},
+        headers={"Retry-After": str(UNAVAILABLE_RETRY_AFTER)},
+    )
+
+
+def create_health_router(mongo: Mongo) -> APIRouter:
+    router = APIRouter()
+
+    @router.get("/health")
+    def health():
+        """Liveness: proces odgovara, bez I/O."""
+        return {"status": "ok"}
+
+    @router.get("/ready")
+    async def ready():
+        """Readiness: instanca moze doci do Mongo baze."""
+        if await mongo.ready():
+            return {"status": "ready"}
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+
+    return router
@@ -0,0 +1,64 @@
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query
+from pydantic import create_model
+
+from common.responses import model_serializer
+
+SUMMARY = "summary"
+
+
+class FieldSelection:
+    """Polja koja klijent trazi (fields=): Mongo projekcija i serializer samo za njih."""
+
+    def __init__(self, model, names: Tuple[str, ...]):
+        self.names = names
+        self.key = ",".join(names)  # za cache kljuceve
+        self.serialize = model_serializer(model, names)
+
+    def projection(self, *extra: str) -> dict:
+        # extra: polja potrebna za cursor (polje sortiranja) iako ih klijent ne trazi
+        return {name: 1 for name in (*self.names, *extra)}
+
+
+@lru_cache(maxsize=256)
+def _selection(model, names: Tuple[str, ...]) -> FieldSelection:
+    return FieldSelection(model, names)
+
+
+@lru_cache(maxsize=None)
+def sparse_model(model):
+    """Response model za odgovore s fields=: id je uvijek tu, ostala polja samo ako su odabrana."""
+    fields = {
+        name: (Optional[field.annotation], None)
+        for name, field in model.model_fields.items() if name != "id"
+    }
+    return create_model(f"{model.__name__}Fields", __doc__=model.__doc__, id=(str, ...), **fields)
+
+
+def field_selector(model, summary: Sequence[str]):
+    """Dependency za fields= na list endpointima.
+
+    fields je lista polja odvojenih zarezom ili "summary" (kompaktni prikaz bez
+    dugih tekstova); bez parametra vraca se cijeli model. Nepoznato polje je 400.
+    """
+    available = tuple(name for name in model.model_fields if name != "id")
+    summary = tuple(name for name in available if name in summary)
+    description = (
+        f"Polja odvojena zarezom ({', '.join(available)}) ili '{SUMMARY}' ({', '.join(summary)}); id se uvijek vraca"
+    )
+
+    def select(fields: Optional[str] = Query(None, description=description)) -> FieldSelection:
+        if not fields:
+            return _selection(model, available)
+        if fields == SUMMARY:
+            return _selection(model, summary)
+        requested = {name.strip() for name in fields.split(",") if name.strip()} - {"id"}
+        unknown = requested.difference(available)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field: {', '.join(sorted(unknown))}")
+        # redoslijed iz modela: isti odabir daje isti cache kljuc
+        return _selection(model, tuple(name for name in available if name in requested))
+
+    return select
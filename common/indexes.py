@@ -0,0 +1,70 @@
+import logging
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# opcije indeksa koje usporedujemo kod reconcile-a
+_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "weights", "default_language")
+
+# IndexOptionsConflict, IndexKeySpecsConflict, IndexAlreadyExists
+_CONFLICT_CODES = (85, 86, 68)
+
+
+def _normalized_key(key) -> list:
+    # text indeks server sprema kao _fts/_ftsx, a polja su u weights
+    items = list(key.items()) if hasattr(key, "items") else list(key)
+    result = []
+    for field, kind in items:
+        if kind == "text" or field in ("_fts", "_ftsx"):
+            if ("_fts", "text") not in result:
+                result += [("_fts", "text"), ("_ftsx", 1)]
+        else:
+            result.append((field, kind))
+    return result
+
+
+def _same(existing: dict, wanted: dict) -> bool:
+    if _normalized_key(existing["key"]) != _normalized_key(wanted["key"]):
+        return False
+    return all(existing.get(opt) == wanted.get(opt) for opt in _OPTIONS)
+
+
+async def ensure_indexes(collection, indexes: list):
+    """Idempotentno uskladuje indekse kolekcije s deklariranima.
+
+    Sigurno je pokrenuti istovremeno iz vise replika: identican createIndexes
+    je no-op, a konflikti se rjesavaju ponovnim citanjem stanja.
+    """
+    existing = await collection.index_information()
+    for model in indexes:
+        wanted = model.document
+        name = wanted["name"]
+        current = existing.get(name)
+        if current is not None and _same(current, wanted):
+            continue
+
+        if current is not None:
+            logger.info("Recreating index %s.%s", collection.name, name)
+            try:
+                await collection.drop_index(name)
+            except OperationFailure as exc:
+                if exc.code != 27:  # IndexNotFound - druga replika ga je vec maknula
+                    raise
+
+        try:
+            await collection.create_indexes([model])
+        except DuplicateKeyError:
+            logger.error("Cannot build unique index %s.%s: duplicate values exist", collection.name, name)
+        except OperationFailure as exc:
+            if exc.code not in _CONFLICT_CODES:
+                raise
+            # druga replika je u meduvremenu kreirala/promijenila indeks
+            current = (await collection.index_information()).get(name)
+            if current is None or not _same(current, wanted):
+                logger.warning("Index %s.%s differs from declaration: %s", collection.name, name, exc)
+
+
+async def ensure_all_indexes(db, declared: dict):
+    for collection_name, indexes in declared.items():
+        await ensure_indexes(db[collection_name], indexes)
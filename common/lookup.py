@@ -0,0 +1,58 @@
+from typing import Callable, Generic, List, Optional, Sequence, TypeVar
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import Query
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from common.batch import check_batch_size
+from common.responses import dump_json, json_bytes_response, with_id
+
+T = TypeVar("T")
+
+
+class BatchLookup(BaseModel, Generic[T]):
+    items: List[T]
+    missing: List[str]
+
+
+def unique_ids(ids: Sequence[str]) -> List[str]:
+    # redoslijed prvog pojavljivanja, bez duplikata i praznih
+    unique = list(dict.fromkeys(id.strip() for id in ids if id and id.strip()))
+    check_batch_size(unique)
+    return unique
+
+
+def batch_ids(
+    ids: Optional[str] = Query(None, description="Id-jevi odvojeni zarezom; vraca {items, missing} umjesto stranice"),
+) -> Optional[List[str]]:
+    return unique_ids(ids.split(",")) if ids is not None else None
+
+
+async def find_by_ids(collection, ids: List[str], projection: Optional[dict] = None, field: str = "_id",
+                      parse: Callable = ObjectId):
+    """Jedan $in upit za sve id-jeve; vraca (dokumenti u redoslijedu ids, id-jevi koji ne postoje).
+
+    Neispravan id (npr. nije ObjectId) se samo javlja kao missing.
+    """
+    keys = {}
+    for id in ids:
+        try:
+            keys[parse(id)] = id
+        except (InvalidId, TypeError, ValueError):
+            pass
+    found = {}
+    if keys:
+        if projection is not None and field != "_id":
+            projection = {**projection, field: 1}
+        async for doc in collection.find({field: {"$in": list(keys)}}, projection):
+            found[keys[doc[field]]] = doc
+    return [found[id] for id in ids if id in found], [id for id in ids if id not in found]
+
+
+def lookup_response(docs, missing: List[str], serialize: Callable[[dict], dict] = with_id,
+                    headers: dict = None) -> Response:
+    return json_bytes_response(
+        dump_json({"items": [serialize(doc) for doc in docs], "missing": missing}), headers=headers
+    )
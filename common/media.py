@@ -0,0 +1,197 @@
+import hashlib
+import os
+import re
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pydantic import BaseModel
+from pymongo import ASCENDING, IndexModel
+
+from common.auth import get_current_user
+from common.db import resolve_database
+
+# Konfiguracija
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(10 * 2**20)))
+MEDIA_CHUNK_SIZE = 255 * 1024  # GridFS default; ujedno velicina jednog dijela odgovora
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"  # id se nikad ne prepisuje
+
+MEDIA_BUCKET = "media"
+MEDIA_INDEXES = {
+    # deduplikacija po sadrzaju
+    f"{MEDIA_BUCKET}.files": [IndexModel([("metadata.sha256", ASCENDING), ("uploadDate", ASCENDING)])],
+}
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class MediaOut(BaseModel):
+    id: str
+    content_type: str
+    length: int
+    sha256: str
+
+
+def _media_out(file: dict) -> dict:
+    return {
+        "id": str(file["_id"]),
+        "content_type": file["metadata"]["content_type"],
+        "length": file["length"],
+        "sha256": file["metadata"]["sha256"],
+    }
+
+
+def parse_range(header: Optional[str], length: int):
+    """Jedan byte range (bytes=a-b, bytes=a-, bytes=-n) -> (start, end) ukljucivo; None = cijela datoteka."""
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None  # vise rangeova ili nepoznat oblik: vraca se cijela datoteka (RFC 9110 dopusta)
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), length - 1) if last else length - 1
+    else:
+        start, end = max(0, length - int(last)), length - 1
+    if start >= length or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{length}"})
+    return start, end
+
+
+class MediaStore:
+    """Slike u GridFS bucketu "media" baze voyageconnect."""
+
+    def __init__(self, db):
+        self.db = db
+        self.files = db[f"{MEDIA_BUCKET}.files"]
+        self._bucket = None
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        # bucket se stvara tek kod prve upotrebe, kad Motor klijent procesa vec postoji
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(
+                resolve_database(self.db), bucket_name=MEDIA_BUCKET, chunk_size_bytes=MEDIA_CHUNK_SIZE
+            )
+        return self._bucket
+
+    async def upload(self, request: Request, filename: str, user: str) -> dict:
+        """Upisuje tijelo zahtjeva dio po dio; u memoriji je najvise jedan GridFS chunk.
+
+        sha256 je poznat tek na kraju, pa se duplikat otkriva nakon upisa: ostaje
+        najstarija kopija, a novi upis se brise. Dvije istovremene iste datoteke
+        tako konvergiraju na isti id.
+        """
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        if not content_type.startswith("image/"):
+            raise HTTPException(status_code=415, detail="Only image uploads are supported")
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > MEDIA_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"File too large (max {MEDIA_MAX_BYTES} bytes)")
+
+        digest = hashlib.sha256()
+        size = 0
+        grid_in = self.bucket.open_upload_stream(
+            filename, metadata={"content_type": content_type, "uploaded_by": user}
+        )
+        try:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > MEDIA_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File too large (max {MEDIA_MAX_BYTES} bytes)")
+                digest.update(chunk)
+                await grid_in.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        if size == 0:
+            await grid_in.abort()
+            raise HTTPException(status_code=400, detail="Empty upload")
+        await grid_in.close()
+
+        sha256 = digest.hexdigest()
+        await self.files.update_one({"_id": grid_in._id}, {"$set": {"metadata.sha256": sha256}})
+        original = await self.files.find_one(
+            {"metadata.sha256": sha256}, sort=[("uploadDate", ASCENDING), ("_id", ASCENDING)]
+        )
+        if original["_id"] != grid_in._id:
+            await self.bucket.delete(grid_in._id)
+        return _media_out(original)
+
+    async def exists(self, media_id: str) -> bool:
+        try:
+            oid = ObjectId(media_id)
+        except (InvalidId, TypeError):
+            return False
+        return await self.files.count_documents({"_id": oid}, limit=1) > 0
+
+    async def check(self, media_id: Optional[str]):
+        # za create/update handlere koji povezuju media_id
+        if media_id is not None and not await self.exists(media_id):
+            raise HTTPException(status_code=400, detail="Unknown media_id")
+
+    async def serve(self, media_id: str, request: Request) -> Response:
+        try:
+            grid_out = await self.bucket.open_download_stream(ObjectId(media_id))
+        except (InvalidId, TypeError, NoFile):
+            raise HTTPException(status_code=404, detail="Media not found")
+        metadata = grid_out.metadata or {}
+        length = grid_out.length
+        etag = f'"{metadata.get("sha256", media_id)}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": MEDIA_CACHE_CONTROL,
+            "Accept-Ranges": "bytes",
+        }
+        if etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}:
+            return Response(status_code=304, headers=headers)
+
+        byte_range = parse_range(request.headers.get("range"), length)
+        if byte_range is not None and request.headers.get("if-range", etag) != etag:
+            byte_range = None  # klijent ima staru verziju: cijela datoteka
+        status_code = 200
+        start, end = 0, length - 1
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+        headers["Content-Length"] = str(end - start + 1)
+
+        async def body():
+            # chunk po chunk iz GridFS-a; readchunk vraca ostatak trenutnog chunka
+            grid_out.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = await grid_out.readchunk()
+                if not data:
+                    break
+                yield data[:remaining]
+                remaining -= len(data)
+
+        return StreamingResponse(body(), status_code=status_code, headers=headers,
+                                 media_type=metadata.get("content_type", "application/octet-stream"))
+
+
+def create_media_router(store: MediaStore) -> APIRouter:
+    router = APIRouter(tags=["Media"])
+
+    @router.post("/media", response_model=MediaOut, status_code=201)
+    async def upload_media(
+        request: Request,
+        filename: str = Query("upload", description="Izvorno ime datoteke"),
+        user: str = Depends(get_current_user),
+    ):
+        """Tijelo zahtjeva je sama slika (Content-Type: image/...), bez multiparta."""
+        return await store.upload(request, filename, user)
+
+    @router.get("/media/{id}", responses={200: {"content": {"image/*": {}}}, 206: {"description": "Partial content"}})
+    async def get_media(id: str, request: Request):
+        return await store.serve(id, request)
+
+    return router
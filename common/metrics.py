@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from pymongo import monitoring
+
+INSTANCE = os.getenv("INSTANCE", "unknown")
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Histogram:
+    # Motor poziva pymongo listenere iz svojih threadova, zato lock
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for labelvalues, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labelvalues + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labelvalues + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = []
+        self._snapshots = {}
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help, labelnames, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def register_snapshot(self, prefix: str, snapshot):
+        """snapshot() vraca dict; brojcane vrijednosti se izvoze kao voyage_<prefix>_<kljuc>."""
+        self._snapshots[prefix] = snapshot
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE voyage_service_info gauge",
+            f"voyage_service_info{_labels(('instance',), (INSTANCE,))} 1",
+        ]
+        for histogram in self._histograms:
+            lines += histogram.render()
+        for prefix, snapshot in self._snapshots.items():
+            for key, value in snapshot().items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    name = f"voyage_{prefix}_{key}"
+                    lines += [f"# TYPE {name} untyped", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and status", ("method", "route", "status")
+)
+MONGO_LATENCY = registry.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("collection", "command", "outcome")
+)
+JWT_DECODE_LATENCY = registry.histogram(
+    "jwt_decode_seconds", "JWT signature verification and decode time (cache misses only)"
+)
+BCRYPT_LATENCY = registry.histogram(
+    "bcrypt_seconds", "bcrypt hash/verify time in the hashing pool", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5),
+)
+BCRYPT_QUEUE_WAIT = registry.histogram(
+    "bcrypt_queue_wait_seconds", "Time a bcrypt job waited for a pool worker", ("operation",)
+)
+
+
+class MetricsMiddleware:
+    """Cisti ASGI middleware: latencija po route templateu (ne po stvarnom URL-u) i statusu."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - started, scope["method"], path, str(status["code"]))
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._inflight = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+        self._inflight[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event, outcome: str):
+        collection, command = self._inflight.pop((event.connection_id, event.request_id), ("", event.command_name))
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, collection, command, outcome)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+mongo_listener = MongoCommandListener()
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,87 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from pymongo import ASCENDING, DESCENDING
+
+# Konfiguracija
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "20"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "100"))
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+        cursor: Optional[str] = Query(None, description="next_cursor iz prethodnog odgovora"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+# Cursor je base64(json) zadnjeg dokumenta na stranici: polje sortiranja, vrijednost i _id
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    value = doc.get(sort_field)
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    payload = {"f": sort_field, "v": value, "i": str(doc["_id"])}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if payload["f"] != sort_field:
+            raise ValueError("cursor belongs to a different ordering")
+        value = payload["v"]
+        if isinstance(value, dict) and "$date" in value:
+            value = datetime.fromisoformat(value["$date"])
+        return value, ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(query: dict, cursor: Optional[str], sort_field: str, descending: bool) -> dict:
+    if not cursor:
+        return query
+    value, last_id = decode_cursor(cursor, sort_field)
+    op = "$lt" if descending else "$gt"
+    after = {"$or": [
+        {sort_field: {op: value}},
+        {sort_field: value, "_id": {op: last_id}},
+    ]}
+    return {"$and": [query, after]} if query else after
+
+
+def keyset_sort(sort_field: str, descending: bool) -> list:
+    direction = DESCENDING if descending else ASCENDING
+    return [(sort_field, direction), ("_id", direction)]
+
+
+async def fetch_page(collection, query: dict, page: PageParams, sort_field: str = "created_at",
+                     descending: bool = True, projection: Optional[dict] = None):
+    """Vraca (dokumenti, next_cursor) za jednu stranicu, bez skip-a."""
+    cursor = collection.find(keyset_filter(query, page.cursor, sort_field, descending), projection)
+    cursor = cursor.sort(keyset_sort(sort_field, descending)).limit(page.limit + 1)
+    docs = await cursor.to_list(page.limit + 1)
+
+    next_cursor = None
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
@@ -0,0 +1,41 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+
+def parse_object_id(id: str) -> ObjectId:
+    try:
+        return ObjectId(id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+
+async def _raise_not_found_or_forbidden(collection, oid: ObjectId, entity: str, action: str):
+    # samo na putu greske: jos jedan upit da razlikujemo 404 od 403
+    if await collection.count_documents({"_id": oid}, limit=1) == 0:
+        raise HTTPException(status_code=404, detail=f"{entity.capitalize()} not found")
+    raise HTTPException(status_code=403, detail=f"Not authorized to {action} this {entity}")
+
+
+async def update_owned(collection, id: str, owner: str, update: dict, entity: str) -> dict:
+    """Azurira dokument vlasnika u jednom round tripu i vraca novu verziju."""
+    oid = parse_object_id(id)
+    doc = await collection.find_one_and_update(
+        {"_id": oid, "created_by": owner},
+        update,
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        await _raise_not_found_or_forbidden(collection, oid, entity, "edit")
+    doc["id"] = str(doc["_id"])
+    return doc
+
+
+async def delete_owned(collection, id: str, owner: str, entity: str) -> dict:
+    """Brise dokument vlasnika u jednom round tripu i vraca obrisani dokument."""
+    oid = parse_object_id(id)
+    doc = await collection.find_one_and_delete({"_id": oid, "created_by": owner})
+    if doc is None:
+        await _raise_not_found_or_forbidden(collection, oid, entity, "delete")
+    return doc
@@ -0,0 +1,68 @@
+from typing import Callable, Optional, Sequence
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return jsonable_encoder(value)
+
+
+def dump_json(payload) -> bytes:
+    # orjson sam serijalizira dict/list/str/datetime; ostalo (ObjectId, modeli) ide kroz _default
+    return orjson.dumps(payload, default=_default)
+
+
+def json_bytes_response(body: bytes, status_code: int = 200, headers: dict = None) -> Response:
+    """Vraca vec serijalizirani JSON bez ponovne validacije kroz response_model."""
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def model_projection(model) -> dict:
+    """Mongo projekcija koja cita samo polja response modela."""
+    return {name: 1 for name in model.model_fields if name != "id"}
+
+
+def with_id(doc: dict) -> dict:
+    doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+def model_serializer(model, names: Optional[Sequence[str]] = None) -> Callable[[dict], dict]:
+    """Mongo dokument -> dict u obliku response modela, bez Pydantic validacije.
+
+    _id se pretvara u id jednom, a polja koja stariji dokumenti nemaju dobivaju
+    default iz modela (kao sto bi ih dodala validacija). names ogranicava izlaz
+    na podskup polja (fields= parametar).
+    """
+    fields = [
+        (name, None if field.is_required() else field.get_default(call_default_factory=True))
+        for name, field in model.model_fields.items() if name != "id" and (names is None or name in names)
+    ]
+
+    def serialize(doc: dict) -> dict:
+        item = {"id": str(doc["_id"])}
+        for name, default in fields:
+            item[name] = doc.get(name, default)
+        return item
+
+    return serialize
+
+
+def page_response(docs, next_cursor: Optional[str], serialize: Callable[[dict], dict] = with_id,
+                  headers: dict = None) -> Response:
+    """Stranica ({items, next_cursor}) serijalizirana direktno u bytes.
+
+    Endpoint zadrzava response_model=Page[...] radi OpenAPI sheme, ali se
+    dokumenti ne validiraju drugi put kroz Pydantic.
+    """
+    return json_bytes_response(
+        dump_json({"items": [serialize(doc) for doc in docs], "next_cursor": next_cursor}), headers=headers
+    )
@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+from common.tasks import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+# Konfiguracija
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "5"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "10000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+SYNC_OVERLAP = timedelta(seconds=30)  # zapisi s vise auth replika ne stizu strogo po revoked_at
+
+REVOKED_TOKENS_COLLECTION = "revoked_tokens"
+# {_id: jti, expires_at, revoked_at}; TTL indeks brise zapis kad token ionako istekne
+REVOKED_TOKENS_INDEXES = [
+    IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    IndexModel([("revoked_at", ASCENDING)]),
+]
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # double hashing: k pozicija iz jednog blake2b digesta
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Opozvani jti-jevi u memoriji: Bloom filter za brzi "sigurno nije opozvan" + tocan skup."""
+
+    def __init__(self, capacity: int = REVOCATION_BLOOM_CAPACITY, error_rate: float = REVOCATION_BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._expires = {}  # jti -> exp (epoch)
+        self._bloom = BloomFilter(capacity, error_rate)
+        self.stats = {"checks": 0, "revoked_hits": 0, "bloom_false_positives": 0, "rebuilds": 0}
+
+    def _rebuild(self):
+        # Bloom ne podrzava brisanje, pa se nakon ciscenja ili rasta gradi iznova
+        self.capacity = max(self.capacity, 2 * len(self._expires))
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        for jti in self._expires:
+            self._bloom.add(jti)
+        self.stats["rebuilds"] += 1
+
+    def add(self, jti: str, expires_at: float):
+        if expires_at <= time.time() or jti in self._expires:
+            return
+        self._expires[jti] = expires_at
+        if len(self._expires) > self.capacity:
+            self._rebuild()
+        else:
+            self._bloom.add(jti)
+
+    def prune(self):
+        now = time.time()
+        expired = [jti for jti, expires_at in self._expires.items() if expires_at <= now]
+        if expired:
+            for jti in expired:
+                del self._expires[jti]
+            self._rebuild()
+
+    def is_revoked(self, jti) -> bool:
+        if not jti:
+            return False
+        self.stats["checks"] += 1
+        if jti not in self._bloom:
+            return False
+        if jti in self._expires:
+            self.stats["revoked_hits"] += 1
+            return True
+        self.stats["bloom_false_positives"] += 1
+        return False
+
+    def snapshot(self) -> dict:
+        return {"size": len(self._expires), "bloom_bits": self._bloom.size, "bloom_hashes": self._bloom.hashes,
+                **self.stats}
+
+
+class RevocationSync:
+    """Periodicno povlaci nove opozive iz revoked_tokens (pise ih auth-service)."""
+
+    def __init__(self, revocations: RevocationList, interval: float = REVOCATION_SYNC_INTERVAL):
+        self.revocations = revocations
+        self.interval = interval
+        self.stats = {"syncs": 0, "sync_failures": 0, "last_sync": 0.0}
+        self._since = None
+        self._collection = None
+        self._task = None
+
+    async def sync(self):
+        query = {"revoked_at": {"$gte": self._since - SYNC_OVERLAP}} if self._since else {}
+        latest = self._since
+        async for doc in self._collection.find(query, {"expires_at": 1, "revoked_at": 1}):
+            # Mongo vraca naivni UTC datetime
+            self.revocations.add(doc["_id"], doc["expires_at"].replace(tzinfo=timezone.utc).timestamp())
+            if latest is None or doc["revoked_at"] > latest:
+                latest = doc["revoked_at"]
+        self._since = latest
+        self.revocations.prune()
+        self.stats["syncs"] += 1
+        self.stats["last_sync"] = time.time()
+
+    async def _sync_counted(self):
+        # PeriodicTask logira gresku, ovdje se samo broji
+        try:
+            await self.sync()
+        except PyMongoError:
+            self.stats["sync_failures"] += 1
+            raise
+
+    async def start(self, db):
+        self._collection = db[REVOKED_TOKENS_COLLECTION]
+        try:
+            # prvi sync odmah, da instanca ne krene s praznom listom
+            await self.sync()
+        except PyMongoError:
+            self.stats["sync_failures"] += 1
+            logger.exception("Initial revocation sync failed")
+        self._task = PeriodicTask(self._sync_counted, self.interval, "revocation-sync")
+        self._task.start()
+
+    async def stop(self):
+        if self._task is not None:
+            await self._task.stop()
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {**self.revocations.snapshot(), **self.stats}
+
+
+def revoked_token_doc(jti: str, expires_at: datetime) -> dict:
+    return {"_id": jti, "expires_at": expires_at, "revoked_at": datetime.utcnow()}
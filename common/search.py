@@ -0,0 +1,132 @@
+import base64
+import logging
+import os
+import re
+import unicodedata
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, Query
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Konfiguracija
+SEARCH_MAX_OFFSET = int(os.getenv("SEARCH_MAX_OFFSET", "500"))
+SEARCH_MAX_TERMS = 200
+
+_WORD = re.compile(r"\w{2,}")
+
+
+def tokenize(text: str) -> List[str]:
+    # mala slova i bez dijakritika (č -> c), da "sibenik" nade "Šibenik"
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).replace("đ", "d")
+    return _WORD.findall(text)
+
+
+def search_terms(*texts: str) -> List[str]:
+    terms = []
+    seen = set()
+    for text in texts:
+        for term in tokenize(text):
+            if term not in seen:
+                seen.add(term)
+                terms.append(term)
+    return terms[:SEARCH_MAX_TERMS]
+
+
+def search_indexes(weights: dict) -> List[IndexModel]:
+    """Text indeks za rangirano pretrazivanje + indeks nad search_terms za prefix (autocomplete)."""
+    return [
+        IndexModel([(field, TEXT) for field in weights], weights=weights, default_language="none", name="search_text"),
+        IndexModel([("search_terms", ASCENDING), ("created_at", DESCENDING)]),
+    ]
+
+
+def search_terms_update(data: dict, fields: Sequence[str]) -> dict:
+    """Dodaje search_terms u $set ako su sva pretraziva polja prisutna."""
+    if all(field in data for field in fields):
+        data["search_terms"] = search_terms(*(data[field] for field in fields))
+    return data
+
+
+async def refresh_search_terms(collection, doc: dict, fields: Sequence[str]):
+    terms = search_terms(*(doc.get(field, "") for field in fields))
+    if terms != doc.get("search_terms"):
+        await collection.update_one({"_id": doc["_id"]}, {"$set": {"search_terms": terms}})
+
+
+async def backfill_search_terms(collection, fields: Sequence[str], batch_size: int = 500):
+    """Popunjava search_terms na dokumentima nastalim prije pretrazivanja."""
+    projection = {field: 1 for field in fields}
+    ops = []
+    filled = 0
+    async for doc in collection.find({"search_terms": {"$exists": False}}, projection):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"search_terms": search_terms(*(doc.get(f, "") for f in fields))}}))
+        if len(ops) >= batch_size:
+            filled += (await collection.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        filled += (await collection.bulk_write(ops, ordered=False)).modified_count
+    if filled:
+        logger.info("Backfilled search_terms on %d %s documents", filled, collection.name)
+
+
+class SearchParams:
+    def __init__(
+        self,
+        q: str = Query(..., min_length=1, max_length=200),
+        prefix: bool = Query(False, description="Autocomplete: zadnja rijec se trazi kao prefiks"),
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = Query(None),
+    ):
+        self.q = q
+        self.prefix = prefix
+        self.limit = limit
+        self.cursor = cursor
+
+    @property
+    def offset(self) -> int:
+        if not self.cursor:
+            return 0
+        try:
+            offset = int(base64.urlsafe_b64decode(self.cursor + "=" * (-len(self.cursor) % 4)))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if offset < 0 or offset > SEARCH_MAX_OFFSET:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return offset
+
+
+def _encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode().rstrip("=")
+
+
+async def search(collection, params: SearchParams, projection: dict):
+    """Vraca (dokumenti, next_cursor).
+
+    Puni tekst ide preko $text indeksa sortirano po textScore; prefix preko
+    search_terms indeksa (range scan na ^prefix), najnoviji prvi. Rangirani
+    rezultati ne mogu po keysetu pa je dubina stranicenja ogranicena (SEARCH_MAX_OFFSET).
+    """
+    offset = params.offset
+    if params.prefix:
+        terms = tokenize(params.q)
+        if not terms:
+            return [], None
+        *whole, last = terms
+        query = {"$and": [{"search_terms": term} for term in whole]
+                 + [{"search_terms": {"$regex": "^" + re.escape(last)}}]}
+        cursor = collection.find(query, projection).sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+    else:
+        projection = {**projection, "score": {"$meta": "textScore"}}
+        cursor = collection.find({"$text": {"$search": params.q}}, projection)
+        cursor = cursor.sort([("score", {"$meta": "textScore"}), ("_id", DESCENDING)])
+
+    docs = await cursor.skip(offset).limit(params.limit + 1).to_list(params.limit + 1)
+    next_cursor = None
+    if len(docs) > params.limit:
+        docs = docs[:params.limit]
+        if offset + params.limit <= SEARCH_MAX_OFFSET:
+            next_cursor = _encode_offset(offset + params.limit)
+    return docs, next_cursor
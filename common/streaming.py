@@ -0,0 +1,44 @@
+import os
+from typing import Callable, Optional
+
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+
+from common.pagination import keyset_filter, keyset_sort
+from common.responses import dump_json, with_id
+
+# Konfiguracija
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# za OpenAPI: endpoint moze vratiti i NDJSON
+NDJSON_RESPONSES = {200: {"content": {NDJSON_MEDIA_TYPE: {}}}}
+
+
+def wants_ndjson(
+    request: Request,
+    stream: bool = Query(False, description="NDJSON stream svih rezultata (ili Accept: application/x-ndjson)"),
+) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_response(collection, query: dict, cursor: Optional[str] = None, sort_field: str = "created_at",
+                    descending: bool = True, projection: Optional[dict] = None,
+                    transform: Callable[[dict], dict] = with_id, headers: Optional[dict] = None) -> StreamingResponse:
+    """Streama sve dokumente (od cursora nadalje) kao NDJSON, jedan po liniji.
+
+    Memorija je ogranicena na jedan batch iz Mongo cursora, bez obzira na velicinu rezultata.
+    """
+    async def lines():
+        docs = collection.find(
+            keyset_filter(query, cursor, sort_field, descending),
+            projection,
+            batch_size=STREAM_BATCH_SIZE,
+        ).sort(keyset_sort(sort_field, descending))
+        try:
+            async for doc in docs:
+                yield dump_json(transform(doc)) + b"\n"
+        finally:
+            await docs.close()
+
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Pokrece async funkciju svakih interval sekundi u pozadini (interval <= 0 gasi task)."""
+
+    def __init__(self, fn, interval: float, name: str, run_at_start: bool = False):
+        self.fn = fn
+        self.interval = interval
+        self.name = name
+        self.run_at_start = run_at_start
+        self._task = None
+
+    async def _loop(self):
+        # mali jitter da replike ne rade isti posao u istoj sekundi
+        delay = random.uniform(0, min(5.0, self.interval)) if self.run_at_start else self.interval
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.interval
+            try:
+                await self.fn()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Periodic task %s failed", self.name)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=self.name)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_background = set()
+
+
+def run_in_background(coro, name: str):
+    """Jednokratni posao u pozadini (npr. backfill kod starta); greske se samo logiraju."""
+    async def runner():
+        try:
+            await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background task %s failed", name)
+
+    task = asyncio.create_task(runner(), name=name)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
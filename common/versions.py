@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from pymongo import UpdateOne
+
+VERSIONS_COLLECTION = "collection_versions"
+
+
+# Verzije: {_id: scope, v: broj izmjena, updated_at}. Scope je ime kolekcije
+# ("destinations") ili kolekcija + roditelj ("comments:<post_id>").
+def scope(collection: str, parent_id: Optional[str] = None) -> str:
+    return f"{collection}:{parent_id}" if parent_id else collection
+
+
+async def bump_versions(db, *scopes: str):
+    """Poziva se iz create/update/delete handlera nakon uspjesnog upisa."""
+    scopes = sorted({s for s in scopes if s})
+    if not scopes:
+        return
+    update = {"$inc": {"v": 1}, "$set": {"updated_at": datetime.utcnow()}}
+    collection = db[VERSIONS_COLLECTION]
+    if len(scopes) <= 4:
+        # pojedinacni handleri diraju 1-2 scopea: paralelni update_one bez bulk omotaca
+        await asyncio.gather(*(collection.update_one({"_id": s}, update, upsert=True) for s in scopes))
+        return
+    ops = [UpdateOne({"_id": s}, update, upsert=True) for s in scopes]
+    await collection.bulk_write(ops, ordered=False)
+
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _etags(header: str):
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+class Validators:
+    """ETag i Last-Modified jednog GET odgovora, izracunati samo iz verzija."""
+
+    def __init__(self, request: Request, etag: str, last_modified: Optional[datetime]):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if last_modified is not None:
+            self.headers["Last-Modified"] = _http_date(last_modified)
+        self.not_modified = self._not_modified(request)
+
+    def _not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match ima prednost pred If-Modified-Since (RFC 9110)
+            return self.etag in _etags(if_none_match)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return self.last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+        return False
+
+    def not_modified_response(self) -> Response:
+        return Response(status_code=304, headers=self.headers)
+
+
+async def conditional(request: Request, db, *scopes: str) -> Validators:
+    """Validatori za GET nad danim scopeovima, bez izvrsavanja samog upita.
+
+    ETag je hash verzija scopeova i URL-a (query parametri i Accept mijenjaju
+    reprezentaciju), pa je jak: ista verzija i isti zahtjev daju iste bajtove.
+    """
+    docs = await db[VERSIONS_COLLECTION].find({"_id": {"$in": list(scopes)}}).to_list(len(scopes))
+    versions = {doc["_id"]: doc for doc in docs}
+    updated = [doc["updated_at"] for doc in docs if doc.get("updated_at")]
+
+    key = "|".join([
+        request.url.path,
+        "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items())),
+        request.headers.get("accept", ""),
+        *(f"{s}:{versions.get(s, {}).get('v', 0)}" for s in scopes),
+    ])
+    etag = '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+    return Validators(request, etag, max(updated) if updated else None)
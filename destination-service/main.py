@@ -1,93 +1,227 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List, Optional
-from jose import JWTError, jwt
+from typing import List, Optional, Union
 from datetime import datetime
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
-from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import ConnectionFailure
 
-app = FastAPI()
+from common.activity import ACTIVITY_COLLECTION, ACTIVITY_INDEXES, ActivityTracker, Ranked, TopK
+from common.auth import get_current_user, revocation_sync
+from common.cache import TTLCache, create_invalidation_channel
+from common.db import Lifespan, Mongo, create_health_router, mongo_unavailable
+from common.fields import FieldSelection, field_selector, sparse_model
+from common.indexes import ensure_all_indexes
+from common.lookup import BatchLookup, batch_ids, find_by_ids, lookup_response
+from common.media import MEDIA_INDEXES, MediaStore, create_media_router
+from common.metrics import MetricsMiddleware, registry, router as metrics_router
+from common.pagination import Page, PageParams, fetch_page
+from common.repository import parse_object_id
+from common.responses import dump_json, json_bytes_response, model_projection, model_serializer, page_response
+from common.search import SearchParams, backfill_search_terms, search, search_indexes, search_terms_update
+from common.tasks import run_in_background
+from common.versions import bump_versions, conditional
 
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
-client = AsyncIOMotorClient(MONGO_URL)
-db = client["voyageconnect"]
+mongo = Mongo()
+lifespan = Lifespan(mongo)
+app = FastAPI(lifespan=lifespan)
+
+db = mongo.db
 destination_collection = db["destinations"]
 
-SECRET_KEY = os.getenv("SECRET_KEY", "tajna123")
-ALGORITHM = "HS256"
-security = HTTPBearer()
+# Cache serijaliziranih odgovora (kljucevi "id:<id>" i "list:<limit>:<cursor>")
+CACHE_CHANNEL = "destinations"
+destination_cache = TTLCache(
+    max_size=int(os.getenv("DESTINATION_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("DESTINATION_CACHE_TTL", "60")),
+)
+registry.register_snapshot("destination_cache", destination_cache.snapshot)
+invalidation = create_invalidation_channel(db)
+invalidation.subscribe(CACHE_CHANNEL, lambda keys, prefixes: destination_cache.invalidate(keys, prefixes))
+
+INDEXES = {
+    "destinations": [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        *search_indexes({"name": 3, "description": 1}),
+    ],
+    ACTIVITY_COLLECTION: ACTIVITY_INDEXES,
+    **MEDIA_INDEXES,
+}
+SEARCH_FIELDS = ("name", "description")
+
+app.add_middleware(MetricsMiddleware)
+app.include_router(metrics_router)
+app.include_router(create_health_router(mongo))
+app.add_exception_handler(ConnectionFailure, mongo_unavailable)
+
+# slike (GridFS), dostupne i kroz post-service
+media = MediaStore(db)
+app.include_router(create_media_router(media))
 
 class DestinationIn(BaseModel):
     name: str
     description: str
     image_url: Optional[str] = None  # može biti null
+    media_id: Optional[str] = None  # slika uploadana kroz POST /media
 
 class DestinationOut(DestinationIn):
     id: str
     created_by: str
     created_at: datetime
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
-    except (JWTError, ValueError, KeyError):
-        raise HTTPException(status_code=401, detail="Invalid token")
+serialize_destination = model_serializer(DestinationOut)
+DESTINATION_PROJECTION = model_projection(DestinationOut)
+DestinationFields = sparse_model(DestinationOut)
+select_destination_fields = field_selector(DestinationOut, summary=("name", "image_url", "media_id", "created_at"))
+
+class TrendingDestination(BaseModel):
+    id: str
+    name: str
+    image_url: Optional[str] = None
+    media_id: Optional[str] = None
+    score: float
+
+TRENDING_FIELDS = ("name", "image_url", "media_id")
+serialize_trending = model_serializer(DestinationOut, TRENDING_FIELDS)
+
+async def hydrate_trending(ids):
+    docs, _ = await find_by_ids(destination_collection, ids, {name: 1 for name in TRENDING_FIELDS})
+    return [serialize_trending(doc) for doc in docs]
+
+# Aktivnost (pregledi ovdje, postovi i komentari iz post/comment-servicea) i rang lista
+activity = ActivityTracker(db)
+trending = TopK(db, "destinations", hydrate_trending)
+registry.register_snapshot("activity", activity.snapshot)
+registry.register_snapshot("trending", trending.snapshot)
+
+async def invalidate_destinations(*ids: str):
+    await invalidation.publish(CACHE_CHANNEL, keys=[f"id:{i}" for i in ids], prefixes=["list:"])
+
+@lifespan.on_startup
+async def create_indexes():
+    await ensure_all_indexes(db, INDEXES)
+    run_in_background(backfill_search_terms(destination_collection, SEARCH_FIELDS), "backfill-destination-search-terms")
+
+@lifespan.on_startup
+async def start_cache_invalidation():
+    await invalidation.start()
+
+@lifespan.on_shutdown
+async def stop_cache_invalidation():
+    await invalidation.stop()
+
+@lifespan.on_startup
+async def start_activity():
+    activity.start()
+    trending.start()
+
+@lifespan.on_shutdown
+async def stop_activity():
+    await trending.stop()
+    await activity.stop()
+
+@lifespan.on_startup
+async def start_revocation_sync():
+    await revocation_sync.start(db)
+
+@lifespan.on_shutdown
+async def stop_revocation_sync():
+    await revocation_sync.stop()
 
 @app.get("/")
 def read_root():
     instance = os.getenv("INSTANCE", "unknown")
     return {"message": f"Hello from destination-service instance {instance}"}
 
-@app.get("/destinations", response_model=List[DestinationOut], tags=["Destinations"])
-async def get_destinations():
-    destinations = await destination_collection.find().to_list(100)
-    return [
-        {
-            "id": str(d["_id"]),
-            "name": d["name"],
-            "description": d["description"],
-            "image_url": d.get("image_url"),
-            "created_by": d["created_by"],
-            "created_at": d["created_at"],
-        }
-        for d in destinations
-    ]
+@app.get(
+    "/destinations",
+    response_model=Union[Page[DestinationFields], BatchLookup[DestinationFields]],
+    tags=["Destinations"],
+)
+async def get_destinations(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(select_destination_fields),
+    ids: Optional[List[str]] = Depends(batch_ids),
+):
+    validators = await conditional(request, db, "destinations")
+    if validators.not_modified:
+        return validators.not_modified_response()
+    if ids is not None:
+        # hidratacija (npr. destinacije postova) jednim zahtjevom umjesto N
+        docs, missing = await find_by_ids(destination_collection, ids, fields.projection())
+        return lookup_response(docs, missing, fields.serialize, headers=validators.headers)
+    cache_key = f"list:{page.limit}:{page.cursor or ''}:{fields.key}"
+    cached = destination_cache.get(cache_key)
+    if cached is not None:
+        # ETag ide uz bajtove iz kojih je nastao (tijelo moze biti starije od trenutne verzije)
+        headers, body = cached
+    else:
+        headers = validators.headers
+        generation = destination_cache.generation
+        destinations, next_cursor = await fetch_page(
+            destination_collection, {}, page, projection=fields.projection("created_at")
+        )
+        items = [fields.serialize(d) for d in destinations]
+        body = dump_json({"items": items, "next_cursor": next_cursor})
+        destination_cache.set(cache_key, (headers, body), generation)
+    return json_bytes_response(body, headers=headers)
 
 @app.post("/destinations", response_model=DestinationOut, tags=["Destinations"])
 async def create_destination(data: DestinationIn, user: str = Depends(get_current_user)):
+    await media.check(data.media_id)
     new_dest = {
         "name": data.name,
         "description": data.description,
         "image_url": data.image_url,
+        "media_id": data.media_id,
         "created_by": user,
         "created_at": datetime.utcnow()
     }
+    search_terms_update(new_dest, SEARCH_FIELDS)
     result = await destination_collection.insert_one(new_dest)
     new_dest["id"] = str(result.inserted_id)
+    await bump_versions(db, "destinations")
+    await invalidate_destinations(new_dest["id"])
     return new_dest
 
-@app.get("/destinations/{id}", response_model=DestinationOut, tags=["Destinations"])
-async def get_destination(id: str):
-    try:
-        dest = await destination_collection.find_one({"_id": ObjectId(id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID format")
-    if not dest:
-        raise HTTPException(status_code=404, detail="Destination not found")
-    return {
-        "id": str(dest["_id"]),
-        "name": dest["name"],
-        "description": dest["description"],
-        "image_url": dest.get("image_url"),
-        "created_by": dest["created_by"],
-        "created_at": dest["created_at"],
-    }
+@app.get("/destinations/search", response_model=Page[DestinationFields], tags=["Destinations"])
+async def search_destinations(
+    request: Request,
+    params: SearchParams = Depends(),
+    fields: FieldSelection = Depends(select_destination_fields),
+):
+    validators = await conditional(request, db, "destinations")
+    if validators.not_modified:
+        return validators.not_modified_response()
+    docs, next_cursor = await search(destination_collection, params, fields.projection())
+    return page_response(docs, next_cursor, fields.serialize, headers=validators.headers)
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+# mora biti prije /destinations/{id}
+@app.get("/destinations/trending", response_model=Ranked[TrendingDestination], tags=["Destinations"])
+async def get_trending_destinations():
+    """Top destinacije po aktivnosti s padom kroz vrijeme; racuna se u pozadini svakih ACTIVITY_TOPK_INTERVAL s."""
+    return trending.response()
 
+@app.get("/destinations/{id}", response_model=DestinationOut, tags=["Destinations"])
+async def get_destination(id: str, request: Request):
+    validators = await conditional(request, db, "destinations")
+    cache_key = f"id:{id}"
+    if validators.not_modified:
+        # pregled se broji samo ako se zna da destinacija postoji (u cacheu je), bez upita
+        if destination_cache.peek(cache_key):
+            activity.bump("destinations", id, "view")
+        return validators.not_modified_response()
+    cached = destination_cache.get(cache_key)
+    if cached is not None:
+        headers, body = cached
+    else:
+        headers = validators.headers
+        generation = destination_cache.generation
+        dest = await destination_collection.find_one({"_id": parse_object_id(id)}, DESTINATION_PROJECTION)
+        if not dest:
+            raise HTTPException(status_code=404, detail="Destination not found")
+        body = dump_json(serialize_destination(dest))
+        destination_cache.set(cache_key, (headers, body), generation)
+    activity.bump("destinations", id, "view")
+    return json_bytes_response(body, headers=headers)
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from common.pagination import encode_cursor
+from common.responses import dump_json
+
+logger = logging.getLogger(__name__)
+
+# Konfiguracija
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "5000"))
+KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+CHANGE_STREAMS = os.getenv("EVENTS_CHANGE_STREAMS", "1") != "0"  # 0: samo lokalni dogadaji
+
+OVERFLOW = object()  # klijent je prespor, mora se spojiti ponovno s Last-Event-ID
+
+
+class Subscriber:
+    def __init__(self, topic_id: str):
+        self.topic_id = topic_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+
+class TopicBroker:
+    """In-process pub/sub po temi; svaki pretplatnik ima ograniceni red."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._recent = OrderedDict()  # dedup lokalnih i change stream dogadaja
+        self.stats = {"published": 0, "delivered": 0, "dropped_subscribers": 0, "duplicates": 0}
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, topic_id: str) -> Subscriber:
+        subscriber = Subscriber(topic_id)
+        self._subscribers.setdefault(topic_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subs = self._subscribers.get(subscriber.topic_id)
+        if subs is not None:
+            subs.discard(subscriber)
+            if not subs:
+                del self._subscribers[subscriber.topic_id]
+
+    def _seen(self, key) -> bool:
+        if key in self._recent:
+            self.stats["duplicates"] += 1
+            return True
+        self._recent[key] = None
+        if len(self._recent) > 10000:
+            self._recent.popitem(last=False)
+        return False
+
+    def publish(self, event_type: str, message: dict):
+        """message mora imati id, topic_id i created_at."""
+        key = (event_type, message["id"], message.get("content") if event_type == "updated" else None)
+        if self._seen(key):
+            return
+        self.stats["published"] += 1
+        for subscriber in list(self._subscribers.get(message["topic_id"], ())):
+            if subscriber.queue.full():
+                # backpressure: ne cekamo sporog klijenta, nego ga odspajamo
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(OVERFLOW)
+                self.unsubscribe(subscriber)
+                self.stats["dropped_subscribers"] += 1
+                continue
+            subscriber.queue.put_nowait((event_type, message))
+            self.stats["delivered"] += 1
+
+
+def message_timestamp() -> datetime:
+    """created_at nove poruke, na milisekundu kao u BSON-u.
+
+    Objavljeni dogadaj i poruka procitana iz baze tako imaju isti SSE id (cursor).
+    """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def public_message(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "topic_id": doc["topic_id"],
+        "content": doc.get("content"),
+        "created_by": doc.get("created_by"),
+        "created_at": doc.get("created_at"),
+    }
+
+
+def format_event(event_type: str, message: dict) -> bytes:
+    lines = []
+    # id samo na created dogadajima: Last-Event-ID je cursor za nastavak (resume)
+    if event_type == "created":
+        lines.append(f"id: {encode_cursor({'_id': message['id'], 'created_at': message['created_at']}, 'created_at')}")
+    lines.append(f"event: {event_type}")
+    return ("\n".join(lines) + "\n").encode() + b"data: " + dump_json(message) + b"\n\n"
+
+
+class ChangeStreamFeed:
+    """Dogadaji s drugih replika preko MongoDB change streama (samo na replica setu)."""
+
+    def __init__(self, collection, broker: TopicBroker):
+        self.collection = collection
+        self.broker = broker
+        self.available = None
+        self._task = None
+
+    async def start(self):
+        if not CHANGE_STREAMS:
+            self.available = False
+            return
+        try:
+            # pre-image omogucuje topic_id za delete dogadaje (MongoDB 6.0+)
+            await self.collection.database.command(
+                "collMod", self.collection.name, changeStreamPreAndPostImages={"enabled": True}
+            )
+        except PyMongoError:
+            pass
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        resume_token = None
+        while True:
+            try:
+                async with self.collection.watch(
+                    [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}],
+                    full_document="updateLookup",
+                    full_document_before_change="whenAvailable",
+                    resume_after=resume_token,
+                ) as stream:
+                    self.available = True
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as exc:
+                if exc.code in (40573, 40324):  # standalone mongod: nema change streamova
+                    logger.info("Change streams unavailable, forum events are local to this instance")
+                    self.available = False
+                    return
+                logger.exception("Change stream failed, retrying")
+            except PyMongoError:
+                logger.exception("Change stream failed, retrying")
+            await asyncio.sleep(1)
+
+    def _dispatch(self, change: dict):
+        op = change["operationType"]
+        if op == "delete":
+            before = change.get("fullDocumentBeforeChange")
+            if before:
+                self.broker.publish("deleted", public_message(before))
+            return
+        doc = change.get("fullDocument")
+        if doc:
+            self.broker.publish("created" if op == "insert" else "updated", public_message(doc))
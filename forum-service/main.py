@@ -1,24 +1,75 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, Path 
+from fastapi import FastAPI, Depends, HTTPException, Query, Path, Header, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List
-from motor.motor_asyncio import AsyncIOMotorClient
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
+from typing import List, Optional, Union
 from datetime import datetime
-from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import ConnectionFailure
+import asyncio
 import os
 import sys
 
-app = FastAPI()
+from common.activity import ACTIVITY_COLLECTION, ACTIVITY_INDEXES, ActivityTracker, Ranked, TopK
+from common.auth import get_current_user, revocation_sync
+from common.cascade import CASCADE_COLLECTION, CASCADE_INDEXES, CascadeWorker, enqueue_cascade
+from common.batch import BatchDeleteIn, BatchResult, check_batch_size, delete_owned_many, insert_many_results
+from common.counters import bump_counter, bump_counters, count_by, reconcile_counters
+from common.db import Lifespan, Mongo, create_health_router, mongo_unavailable
+from common.fields import FieldSelection, field_selector, sparse_model
+from common.indexes import ensure_all_indexes
+from common.lookup import BatchLookup, batch_ids, find_by_ids, lookup_response
+from common.metrics import MetricsMiddleware, registry, router as metrics_router
+from common.pagination import Page, PageParams, decode_cursor, fetch_page, keyset_filter, keyset_sort
+from common.repository import delete_owned, parse_object_id, update_owned
+from common.responses import model_serializer, page_response
+from common.search import (
+    SearchParams, backfill_search_terms, refresh_search_terms, search, search_indexes, search_terms_update,
+)
+from common.streaming import NDJSON_RESPONSES, ndjson_response, wants_ndjson
+from common.tasks import PeriodicTask, run_in_background
+from common.versions import bump_versions, conditional, scope
+from events import (
+    KEEPALIVE_SECONDS, MAX_SUBSCRIBERS, OVERFLOW, ChangeStreamFeed, TopicBroker, format_event, message_timestamp,
+    public_message,
+)
 
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
-SECRET_KEY = os.getenv("SECRET_KEY", "velikitajnikljuckojitrebapromjenit")
-ALGORITHM = "HS256"
+mongo = Mongo()
+lifespan = Lifespan(mongo)
+app = FastAPI(lifespan=lifespan)
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.voyageconnect
+COUNTER_RECONCILE_INTERVAL = float(os.getenv("COUNTER_RECONCILE_INTERVAL", "3600"))
+EVENTS_REPLAY_LIMIT = int(os.getenv("EVENTS_REPLAY_LIMIT", "1000"))
 
-security = HTTPBearer()
+db = mongo.db
+
+INDEXES = {
+    "forum_topics": [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("last_activity_at", ASCENDING), ("_id", ASCENDING)]),
+        *search_indexes({"title": 3, "description": 1}),
+    ],
+    "forum_messages": [IndexModel([("topic_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])],
+    CASCADE_COLLECTION: CASCADE_INDEXES,
+    ACTIVITY_COLLECTION: ACTIVITY_INDEXES,
+}
+
+# poruke obrisanih tema brisu se u pozadini
+cascade_worker = CascadeWorker(db)
+registry.register_snapshot("cascade", cascade_worker.snapshot)
+
+# Real-time dogadaji za poruke (SSE)
+broker = TopicBroker()
+change_feed = ChangeStreamFeed(db.forum_messages, broker)
+registry.register_snapshot("forum_events", lambda: {
+    "subscribers": broker.subscriber_count,
+    "change_streams": change_feed.available,
+    **broker.stats,
+})
+
+app.add_middleware(MetricsMiddleware)
+app.include_router(metrics_router)
+app.include_router(create_health_router(mongo))
+app.add_exception_handler(ConnectionFailure, mongo_unavailable)
 
 class TopicIn(BaseModel):
     title: str
@@ -28,6 +79,8 @@ class TopicOut(TopicIn):
     id: str
     created_by: str
     created_at: datetime
+    message_count: int = 0
+    last_activity_at: Optional[datetime] = None
 
 class MessageIn(BaseModel):
     topic_id: str
@@ -38,17 +91,89 @@ class MessageOut(MessageIn):
     created_by: str
     created_at: datetime
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_email: str = payload.get("sub")
-        if user_email is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth token")
-        return user_email
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid auth token")
 
+TopicFields = sparse_model(TopicOut)
+MessageFields = sparse_model(MessageOut)
+select_topic_fields = field_selector(
+    TopicOut, summary=("title", "created_by", "created_at", "message_count", "last_activity_at")
+)
+select_message_fields = field_selector(MessageOut, summary=("topic_id", "created_by", "created_at"))
+
+class HotTopic(BaseModel):
+    id: str
+    title: str
+    message_count: int = 0
+    last_activity_at: Optional[datetime] = None
+    score: float
+
+HOT_FIELDS = ("title", "message_count", "last_activity_at")
+serialize_hot = model_serializer(TopicOut, HOT_FIELDS)
+
+async def hydrate_hot(ids):
+    docs, _ = await find_by_ids(db.forum_topics, ids, {name: 1 for name in HOT_FIELDS})
+    return [serialize_hot(doc) for doc in docs]
+
+# Aktivnost tema (pregledi i poruke) i rang lista
+activity = ActivityTracker(db)
+hot_topics = TopK(db, "forum_topics", hydrate_hot)
+registry.register_snapshot("activity", activity.snapshot)
+registry.register_snapshot("hot_topics", hot_topics.snapshot)
+
+TOPIC_SEARCH_FIELDS = ("title", "description")
+TOPIC_SORT_FIELDS = {"created": "created_at", "activity": "last_activity_at"}
+
+async def reconcile_message_counts():
+    repaired = await reconcile_counters(
+        db.forum_topics, db.forum_messages, "topic_id", "message_count", touch="last_activity_at"
+    )
+    if repaired:
+        await bump_versions(db, "forum_topics")
+
+# run_at_start popunjava brojace i last_activity_at na starim temama
+counter_reconciler = PeriodicTask(
+    reconcile_message_counts, COUNTER_RECONCILE_INTERVAL, "reconcile-message-counts", run_at_start=True
+)
+
+@lifespan.on_startup
+async def create_indexes():
+    await ensure_all_indexes(db, INDEXES)
+    run_in_background(backfill_search_terms(db.forum_topics, TOPIC_SEARCH_FIELDS), "backfill-topic-search-terms")
+
+@lifespan.on_startup
+async def start_background_tasks():
+    counter_reconciler.start()
+    await change_feed.start()
+
+@lifespan.on_shutdown
+async def stop_background_tasks():
+    await counter_reconciler.stop()
+    await change_feed.stop()
+
+@lifespan.on_startup
+async def start_revocation_sync():
+    await revocation_sync.start(db)
+
+@lifespan.on_shutdown
+async def stop_revocation_sync():
+    await revocation_sync.stop()
+
+@lifespan.on_startup
+async def start_cascade_worker():
+    cascade_worker.start()
+
+@lifespan.on_shutdown
+async def stop_cascade_worker():
+    await cascade_worker.stop()
+
+@lifespan.on_startup
+async def start_activity():
+    activity.start()
+    hot_topics.start()
+
+@lifespan.on_shutdown
+async def stop_activity():
+    await hot_topics.stop()
+    await activity.stop()
 
 @app.get("/")
 def read_root():
@@ -64,30 +189,131 @@ async def create_topic(topic: TopicIn, user: str = Depends(get_current_user)):
     data = topic.dict()
     data["created_by"] = user
     data["created_at"] = datetime.utcnow()
+    data["message_count"] = 0
+    data["last_activity_at"] = data["created_at"]
+    search_terms_update(data, TOPIC_SEARCH_FIELDS)
     result = await db.forum_topics.insert_one(data)
     data["id"] = str(result.inserted_id)
+    await bump_versions(db, "forum_topics")
     return data
 
-@app.get("/topics", response_model=List[TopicOut], tags=["Topics"])
-async def get_topics():
-    cursor = db.forum_topics.find()
-    topics = []
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        topics.append(TopicOut(**doc))
-    return topics
+@app.get(
+    "/topics",
+    response_model=Union[Page[TopicFields], BatchLookup[TopicFields]],
+    tags=["Topics"],
+    responses=NDJSON_RESPONSES,
+)
+async def get_topics(
+    request: Request,
+    sort: str = Query("created", pattern="^(created|activity)$"),
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(select_topic_fields),
+    ndjson: bool = Depends(wants_ndjson),
+    ids: Optional[List[str]] = Depends(batch_ids),
+):
+    validators = await conditional(request, db, "forum_topics")
+    if validators.not_modified:
+        return validators.not_modified_response()
+    if ids is not None:
+        # ids je lookup, ne stranica: uvijek JSON
+        docs, missing = await find_by_ids(db.forum_topics, ids, fields.projection())
+        return lookup_response(docs, missing, fields.serialize, headers=validators.headers)
+    sort_field = TOPIC_SORT_FIELDS[sort]
+    if ndjson:
+        return ndjson_response(db.forum_topics, {}, page.cursor, sort_field, projection=fields.projection(),
+                               transform=fields.serialize, headers=validators.headers)
+    docs, next_cursor = await fetch_page(db.forum_topics, {}, page, sort_field, projection=fields.projection(sort_field))
+    return page_response(docs, next_cursor, fields.serialize, headers=validators.headers)
+
+@app.get("/topics/search", response_model=Page[TopicFields], tags=["Topics"])
+async def search_topics(
+    request: Request,
+    params: SearchParams = Depends(),
+    fields: FieldSelection = Depends(select_topic_fields),
+):
+    validators = await conditional(request, db, "forum_topics")
+    if validators.not_modified:
+        return validators.not_modified_response()
+    docs, next_cursor = await search(db.forum_topics, params, fields.projection())
+    return page_response(docs, next_cursor, fields.serialize, headers=validators.headers)
+
+# mora biti prije /topics/{id}
+@app.get("/topics/hot", response_model=Ranked[HotTopic], tags=["Topics"])
+async def get_hot_topics():
+    """Najaktivnije teme s padom kroz vrijeme; racuna se u pozadini svakih ACTIVITY_TOPK_INTERVAL s."""
+    return hot_topics.response()
 
 @app.get("/topics/{id}", response_model=TopicOut, tags=["Topics"])
-async def get_topic(id: str):
-    try:
-        topic = await db.forum_topics.find_one({"_id": ObjectId(id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Nevažeći ID format")
+async def get_topic(id: str, request: Request, response: Response):
+    validators = await conditional(request, db, "forum_topics")
+    if validators.not_modified:
+        # 304 ne cita temu, pa se ne zna postoji li; pregled se ne broji
+        return validators.not_modified_response()
+    topic = await db.forum_topics.find_one({"_id": parse_object_id(id)})
     if not topic:
         raise HTTPException(status_code=404, detail="Tema nije pronađena")
+    activity.bump("forum_topics", id, "view")
     topic["id"] = str(topic["_id"])
+    response.headers.update(validators.headers)
     return TopicOut(**topic)
 
+@app.get("/topics/{id}/events", tags=["Topics"], response_class=StreamingResponse)
+async def topic_events(
+    request: Request,
+    id: str,
+    after: Optional[str] = Query(None, description="Cursor (id zadnjeg primljenog dogadaja) od kojeg se nastavlja"),
+    last_event_id: Optional[str] = Header(None),
+):
+    if not await db.forum_topics.count_documents({"_id": parse_object_id(id)}, limit=1):
+        raise HTTPException(status_code=404, detail="Tema nije pronađena")
+    resume = after or last_event_id
+    if resume:
+        decode_cursor(resume, "created_at")  # 400 prije nego sto stream krene
+    if broker.subscriber_count >= MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many subscribers", headers={"Retry-After": "5"})
+
+    # pretplata prije replaya da ne propustimo nista izmedu
+    subscriber = broker.subscribe(id)
+
+    async def events():
+        try:
+            replayed = set()
+            if resume:
+                query = keyset_filter({"topic_id": id}, resume, "created_at", False)
+                cursor = db.forum_messages.find(query).sort(keyset_sort("created_at", False)).limit(EVENTS_REPLAY_LIMIT)
+                async for doc in cursor:
+                    message = public_message(doc)
+                    replayed.add(message["id"])
+                    yield format_event("created", message)
+                if len(replayed) >= EVENTS_REPLAY_LIMIT:
+                    # previse propustenih poruka: klijent neka ih dohvati preko GET /messages
+                    yield b"event: reset\ndata: {}\n\n"
+                    return
+
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield b": keepalive\n\n"
+                    continue
+                if item is OVERFLOW:
+                    yield b"event: overflow\ndata: {}\n\n"
+                    return
+                event_type, message = item
+                if event_type == "created" and message["id"] in replayed:
+                    continue
+                yield format_event(event_type, message)
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.patch("/topics/{id}", response_model=TopicOut, tags=["Topics"])
 async def update_topic(
     id: str = Path(...),
@@ -98,15 +324,11 @@ async def update_topic(
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    topic = await db.forum_topics.find_one({"_id": ObjectId(id)})
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    if topic["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to edit this topic")
-
-    await db.forum_topics.update_one({"_id": ObjectId(id)}, {"$set": update_data})
-    updated_topic = await db.forum_topics.find_one({"_id": ObjectId(id)})
-    updated_topic["id"] = str(updated_topic["_id"])
+    search_terms_update(update_data, TOPIC_SEARCH_FIELDS)
+    updated_topic = await update_owned(db.forum_topics, id, user_email, {"$set": update_data}, "topic")
+    if "search_terms" not in update_data:
+        await refresh_search_terms(db.forum_topics, updated_topic, TOPIC_SEARCH_FIELDS)
+    await bump_versions(db, "forum_topics")
     return updated_topic
 
 @app.delete("/topics/{id}", status_code=204, tags=["Topics"])
@@ -114,32 +336,79 @@ async def delete_topic(
     id: str = Path(...),
     user_email: str = Depends(get_current_user)
 ):
-    topic = await db.forum_topics.find_one({"_id": ObjectId(id)})
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
-    if topic["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this topic")
-
-    await db.forum_topics.delete_one({"_id": ObjectId(id)})
+    await delete_owned(db.forum_topics, id, user_email, "topic")
+    await enqueue_cascade(db, "forum_messages", {"topic_id": id}, scopes=[scope("forum_messages", id)])
+    cascade_worker.kick()
+    await bump_versions(db, "forum_topics", scope("forum_messages", id))
     return
 
 @app.post("/messages", response_model=MessageOut, tags=["Messages"])
 async def post_message(message: MessageIn, user: str = Depends(get_current_user)):
     doc = message.dict()
     doc["created_by"] = user
-    doc["created_at"] = datetime.utcnow()
+    doc["created_at"] = message_timestamp()
     result = await db.forum_messages.insert_one(doc)
     doc["id"] = str(result.inserted_id)
+    topic = await bump_counter(db.forum_topics, message.topic_id, "message_count", 1, "last_activity_at",
+                               doc["created_at"], projection={"_id": 1})
+    if topic:
+        activity.bump("forum_topics", message.topic_id, "message")
+    await bump_versions(db, scope("forum_messages", message.topic_id), "forum_topics")
+    broker.publish("created", public_message(doc))
     return doc
 
-@app.get("/messages", response_model=List[MessageOut], tags=["Messages"])
-async def get_messages(topic_id: str = Query(...)):
-    cursor = db.forum_messages.find({"topic_id": topic_id})
-    results = []
-    async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        results.append(MessageOut(**doc))
-    return results
+@app.post("/messages:batch", response_model=BatchResult, tags=["Messages"])
+async def post_messages_batch(messages: List[MessageIn], user: str = Depends(get_current_user)):
+    check_batch_size(messages)
+    now = message_timestamp()
+    docs = [{**message.dict(), "created_by": user, "created_at": now} for message in messages]
+    results = await insert_many_results(db.forum_messages, docs, list(range(len(docs))))
+    created = [doc for doc, result in zip(docs, results) if result["status"] == "created"]
+    counts = count_by(created, "topic_id")
+    await bump_counters(db.forum_topics, counts, "message_count", "last_activity_at", now)
+    if created:
+        # aktivnost samo za teme koje postoje
+        topics, _ = await find_by_ids(db.forum_topics, list(counts), {"_id": 1})
+        existing = {str(topic["_id"]) for topic in topics}
+        for doc in created:
+            if doc["topic_id"] in existing:
+                activity.bump("forum_topics", doc["topic_id"], "message")
+    if created:
+        await bump_versions(db, "forum_topics", *(scope("forum_messages", doc["topic_id"]) for doc in created))
+    for doc in created:
+        broker.publish("created", public_message(doc))
+    return {"results": results}
+
+@app.delete("/messages:batch", response_model=BatchResult, tags=["Messages"])
+async def delete_messages_batch(batch: BatchDeleteIn, user_email: str = Depends(get_current_user)):
+    check_batch_size(batch.ids)
+    results, deleted = await delete_owned_many(db.forum_messages, batch.ids, user_email, {"topic_id": 1})
+    await bump_counters(db.forum_topics, count_by(deleted, "topic_id", -1), "message_count")
+    if deleted:
+        await bump_versions(db, "forum_topics", *(scope("forum_messages", doc["topic_id"]) for doc in deleted))
+    for doc in deleted:
+        broker.publish("deleted", public_message(doc))
+    return {"results": results}
+
+@app.get("/messages", response_model=Page[MessageFields], tags=["Messages"], responses=NDJSON_RESPONSES)
+async def get_messages(
+    request: Request,
+    topic_id: str = Query(...),
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(select_message_fields),
+    ndjson: bool = Depends(wants_ndjson),
+):
+    validators = await conditional(request, db, scope("forum_messages", topic_id))
+    if validators.not_modified:
+        return validators.not_modified_response()
+    query = {"topic_id": topic_id}
+    if ndjson:
+        return ndjson_response(db.forum_messages, query, page.cursor, descending=False, projection=fields.projection(),
+                               transform=fields.serialize, headers=validators.headers)
+    docs, next_cursor = await fetch_page(
+        db.forum_messages, query, page, descending=False, projection=fields.projection("created_at")
+    )
+    return page_response(docs, next_cursor, fields.serialize, headers=validators.headers)
 
 @app.patch("/messages/{id}", response_model=MessageOut, tags=["Messages"])
 async def update_message(
@@ -148,18 +417,14 @@ async def update_message(
     user_email: str = Depends(get_current_user)
 ):
     update_data = message_update.dict(exclude_unset=True)
+    # premjestanje poruke u drugu temu pokvarilo bi brojace tema
+    update_data.pop("topic_id", None)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    message = await db.forum_messages.find_one({"_id": ObjectId(id)})
-    if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
-    if message["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to edit this message")
-
-    await db.forum_messages.update_one({"_id": ObjectId(id)}, {"$set": update_data})
-    updated_message = await db.forum_messages.find_one({"_id": ObjectId(id)})
-    updated_message["id"] = str(updated_message["_id"])
+    updated_message = await update_owned(db.forum_messages, id, user_email, {"$set": update_data}, "message")
+    await bump_versions(db, scope("forum_messages", updated_message["topic_id"]))
+    broker.publish("updated", public_message(updated_message))
     return updated_message
 
 @app.delete("/messages/{id}", status_code=204, tags=["Messages"])
@@ -167,15 +432,8 @@ async def delete_message(
     id: str = Path(...),
     user_email: str = Depends(get_current_user)
 ):
-    message = await db.forum_messages.find_one({"_id": ObjectId(id)})
-    if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
-    if message["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this message")
-
-    await db.forum_messages.delete_one({"_id": ObjectId(id)})
+    message = await delete_owned(db.forum_messages, id, user_email, "message")
+    await bump_counter(db.forum_topics, message["topic_id"], "message_count", -1)
+    await bump_versions(db, scope("forum_messages", message["topic_id"]), "forum_topics")
+    broker.publish("deleted", public_message(message))
     return
-
-@app.get("/health")
-def health():
-    return {"status": "ok"}
@@ -0,0 +1,34 @@
+from common.pagination import PageParams, keyset_filter, keyset_sort
+
+
+def feed_pipeline(query: dict, page: PageParams, projection: dict) -> list:
+    """Jedna agregacija: stranica postova + sazetak destinacije (broj komentara je vec na postu)."""
+    return [
+        {"$match": keyset_filter(query, page.cursor, "created_at", True)},
+        {"$sort": dict(keyset_sort("created_at", True))},
+        {"$limit": page.limit + 1},
+        {"$project": projection},
+        {"$lookup": {
+            "from": "destinations",
+            "let": {"destination_id": {"$convert": {
+                "input": "$destination_id", "to": "objectId", "onError": None, "onNull": None,
+            }}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$destination_id"]}}},
+                {"$project": {"name": 1, "image_url": 1, "media_id": 1}},
+            ],
+            "as": "destination",
+        }},
+    ]
+
+
+def serialize_feed_item(doc: dict, serialize_post) -> dict:
+    item = serialize_post(doc)
+    destination = doc["destination"][0] if doc.get("destination") else None
+    item["destination"] = {
+        "id": str(destination["_id"]),
+        "name": destination["name"],
+        "image_url": destination.get("image_url"),
+        "media_id": destination.get("media_id"),
+    } if destination else None
+    return item
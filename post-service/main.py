@@ -1,46 +1,142 @@
-from fastapi import FastAPI, Depends, HTTPException, Path
+from fastapi import FastAPI, Depends, HTTPException, Path, Request
 from pydantic import BaseModel
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List, Optional
-from jose import JWTError, jwt
-from bson import ObjectId
+from typing import List, Optional, Union
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import ConnectionFailure
 from datetime import datetime
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
-from typing import Optional
 import sys
 
-app = FastAPI()
+from common.activity import ActivityTracker
+from common.auth import get_current_user, revocation_sync
+from common.cascade import CASCADE_COLLECTION, CASCADE_INDEXES, CascadeWorker, enqueue_cascade
+from common.cache import TTLCache, create_invalidation_channel
+from common.db import Lifespan, Mongo, create_health_router, mongo_unavailable
+from common.fields import FieldSelection, field_selector, sparse_model
+from common.indexes import ensure_all_indexes
+from common.lookup import BatchLookup, batch_ids, find_by_ids, lookup_response
+from common.media import MEDIA_INDEXES, MediaStore, create_media_router
+from common.metrics import MetricsMiddleware, registry, router as metrics_router
+from common.pagination import Page, PageParams, encode_cursor, fetch_page
+from common.repository import delete_owned, update_owned
+from common.responses import dump_json, json_bytes_response, model_projection, model_serializer, page_response
+from common.search import (
+    SearchParams, backfill_search_terms, refresh_search_terms, search, search_indexes, search_terms_update,
+)
+from common.tasks import run_in_background
+from common.versions import bump_versions, conditional, scope
+from feed import feed_pipeline, serialize_feed_item
 
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
-client = AsyncIOMotorClient(MONGO_URL)
-db = client["voyageconnect"]
+mongo = Mongo()
+lifespan = Lifespan(mongo)
+app = FastAPI(lifespan=lifespan)
+
+db = mongo.db
 posts = db["posts"]
 
-# JWT
-SECRET_KEY = os.getenv("SECRET_KEY", "tajna123")
-ALGORITHM = "HS256"
-security = HTTPBearer()
+INDEXES = {
+    "posts": [
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("destination_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        *search_indexes({"title": 3, "content": 1}),
+    ],
+    CASCADE_COLLECTION: CASCADE_INDEXES,
+    **MEDIA_INDEXES,
+}
+SEARCH_FIELDS = ("title", "content")
+
+# Cache feed odgovora; broj komentara moze kasniti najvise FEED_CACHE_TTL sekundi
+FEED_CACHE_TTL = int(os.getenv("FEED_CACHE_TTL", "10"))
+CACHE_CHANNEL = "posts"
+feed_cache = TTLCache(max_size=int(os.getenv("FEED_CACHE_SIZE", "500")), ttl=FEED_CACHE_TTL)
+registry.register_snapshot("feed_cache", feed_cache.snapshot)
+# komentari obrisanih postova brisu se u pozadini
+cascade_worker = CascadeWorker(db)
+registry.register_snapshot("cascade", cascade_worker.snapshot)
+# novi postovi dizu aktivnost destinacije (trending u destination-service)
+activity = ActivityTracker(db)
+registry.register_snapshot("activity", activity.snapshot)
+invalidation = create_invalidation_channel(db)
+invalidation.subscribe(CACHE_CHANNEL, lambda keys, prefixes: feed_cache.invalidate(keys, prefixes))
+
+app.add_middleware(MetricsMiddleware)
+app.include_router(metrics_router)
+app.include_router(create_health_router(mongo))
+app.add_exception_handler(ConnectionFailure, mongo_unavailable)
+
+# slike (GridFS), isti bucket kao u destination-service
+media = MediaStore(db)
+app.include_router(create_media_router(media))
 
 # modeli
 class PostIn(BaseModel):
     title: str
     content: str
     image_url: Optional[str] = None
+    media_id: Optional[str] = None  # slika uploadana kroz POST /media
     destination_id: str
 
 class PostOut(PostIn):
     id: str
     created_by: str
     created_at: datetime
+    comment_count: int = 0  # odrzava comment-service
+
+class DestinationSummary(BaseModel):
+    id: str
+    name: str
+    image_url: Optional[str] = None
+    media_id: Optional[str] = None
+
+class FeedItem(PostOut):
+    destination: Optional[DestinationSummary] = None
+
+serialize_post = model_serializer(PostOut)
+POST_PROJECTION = model_projection(PostOut)
+PostFields = sparse_model(PostOut)
+select_post_fields = field_selector(
+    PostOut, summary=("title", "image_url", "media_id", "destination_id", "created_by", "created_at", "comment_count")
+)
+
+async def invalidate_feed():
+    await invalidation.publish(CACHE_CHANNEL, prefixes=["feed:"])
+
+@lifespan.on_startup
+async def create_indexes():
+    await ensure_all_indexes(db, INDEXES)
+    run_in_background(backfill_search_terms(posts, SEARCH_FIELDS), "backfill-post-search-terms")
+
+@lifespan.on_startup
+async def start_cache_invalidation():
+    await invalidation.start()
+
+@lifespan.on_shutdown
+async def stop_cache_invalidation():
+    await invalidation.stop()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["sub"]
-    except (JWTError, ValueError, KeyError):
-        raise HTTPException(status_code=401, detail="Invalid token")
+@lifespan.on_startup
+async def start_revocation_sync():
+    await revocation_sync.start(db)
+
+@lifespan.on_shutdown
+async def stop_revocation_sync():
+    await revocation_sync.stop()
+
+@lifespan.on_startup
+async def start_cascade_worker():
+    cascade_worker.start()
+
+@lifespan.on_shutdown
+async def stop_cascade_worker():
+    await cascade_worker.stop()
+
+@lifespan.on_startup
+async def start_activity():
+    activity.start()
+
+@lifespan.on_shutdown
+async def stop_activity():
+    await activity.stop()
 
 @app.get("/")
 def read_root():
@@ -51,32 +147,81 @@ def read_root():
 def crash():
     sys.exit(1)  # simulacija pada apl
 
-@app.get("/posts", response_model=List[PostOut], tags=["Posts"])
-async def get_posts(destination_id: Optional[str] = None):
+@app.get("/posts", response_model=Union[Page[PostFields], BatchLookup[PostFields]], tags=["Posts"])
+async def get_posts(
+    request: Request,
+    destination_id: Optional[str] = None,
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(select_post_fields),
+    ids: Optional[List[str]] = Depends(batch_ids),
+):
+    validators = await conditional(request, db, "posts")
+    if validators.not_modified:
+        return validators.not_modified_response()
+    if ids is not None:
+        docs, missing = await find_by_ids(posts, ids, fields.projection())
+        return lookup_response(docs, missing, fields.serialize, headers=validators.headers)
     query = {"destination_id": destination_id} if destination_id else {}
-    docs = await posts.find(query).to_list(100)
-    return [
-        {
-            "id": str(p["_id"]),
-            "title": p["title"],
-            "content": p["content"],
-            "image_url": p.get("image_url"),
-            "destination_id": p["destination_id"],
-            "created_by": p["created_by"],
-            "created_at": p["created_at"]
-        }
-        for p in docs
-    ]
+    docs, next_cursor = await fetch_page(posts, query, page, projection=fields.projection("created_at"))
+    return page_response(docs, next_cursor, fields.serialize, headers=validators.headers)
+
+@app.get("/posts/search", response_model=Page[PostFields], tags=["Posts"])
+async def search_posts(
+    request: Request,
+    params: SearchParams = Depends(),
+    fields: FieldSelection = Depends(select_post_fields),
+):
+    validators = await conditional(request, db, "posts")
+    if validators.not_modified:
+        return validators.not_modified_response()
+    docs, next_cursor = await search(posts, params, fields.projection())
+    return page_response(docs, next_cursor, fields.serialize, headers=validators.headers)
+
+@app.get("/feed", response_model=Page[FeedItem], tags=["Posts"])
+async def get_feed(request: Request, destination_id: Optional[str] = None, page: PageParams = Depends()):
+    # feed ukljucuje sazetke destinacija pa ovisi i o njihovoj verziji
+    validators = await conditional(request, db, "posts", "destinations")
+    validators.headers["Cache-Control"] = f"public, max-age={FEED_CACHE_TTL}"
+    if validators.not_modified:
+        return validators.not_modified_response()
+    cache_key = f"feed:{destination_id or ''}:{page.limit}:{page.cursor or ''}"
+    cached = feed_cache.get(cache_key)
+    if cached is not None:
+        # ETag ide uz bajtove iz kojih je nastao: tijelo izgradeno prije bumpa verzije
+        # ne smije se klijentu spremiti pod novim ETagom
+        headers, body = cached
+    else:
+        headers = validators.headers
+        generation = feed_cache.generation
+        query = {"destination_id": destination_id} if destination_id else {}
+        docs = await posts.aggregate(feed_pipeline(query, page, POST_PROJECTION)).to_list(page.limit + 1)
+        next_cursor = None
+        if len(docs) > page.limit:
+            docs = docs[:page.limit]
+            next_cursor = encode_cursor(docs[-1], "created_at")
+        items = [serialize_feed_item(doc, serialize_post) for doc in docs]
+        body = dump_json({"items": items, "next_cursor": next_cursor})
+        feed_cache.set(cache_key, (headers, body), generation)
+    return json_bytes_response(body, headers=headers)
 
 @app.post("/posts", response_model=PostOut, tags=["Posts"])
 async def create_post(post: PostIn, user: str = Depends(get_current_user)):
+    await media.check(post.media_id)
     doc = {
         **post.model_dump(),
         "created_by": user,
-        "created_at": datetime.utcnow()
+        "created_at": datetime.utcnow(),
+        "comment_count": 0,
     }
+    search_terms_update(doc, SEARCH_FIELDS)
     result = await posts.insert_one(doc)
     doc["id"] = str(result.inserted_id)
+    # aktivnost samo za destinaciju koja postoji (trending u destination-service)
+    destinations, _ = await find_by_ids(db.destinations, [post.destination_id], {"_id": 1})
+    if destinations:
+        activity.bump("destinations", post.destination_id, "post")
+    await bump_versions(db, "posts")
+    await invalidate_feed()
     return doc
 
 
@@ -89,16 +234,14 @@ async def update_post(
     update_data = post_update.dict(exclude_unset=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields provided for update")
+    await media.check(update_data.get("media_id"))
 
-    post = await db.posts.find_one({"_id": ObjectId(id)})
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    if post["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to edit this post")
-
-    await db.posts.update_one({"_id": ObjectId(id)}, {"$set": update_data})
-    updated_post = await db.posts.find_one({"_id": ObjectId(id)})
-    updated_post["id"] = str(updated_post["_id"])
+    search_terms_update(update_data, SEARCH_FIELDS)
+    updated_post = await update_owned(db.posts, id, user_email, {"$set": update_data}, "post")
+    if "search_terms" not in update_data:
+        await refresh_search_terms(db.posts, updated_post, SEARCH_FIELDS)
+    await bump_versions(db, "posts")
+    await invalidate_feed()
     return updated_post
 
 @app.delete("/posts/{id}", status_code=204,  tags=["Posts"])
@@ -106,15 +249,9 @@ async def delete_post(
     id: str = Path(...),
     user_email: str = Depends(get_current_user)
 ):
-    post = await db.posts.find_one({"_id": ObjectId(id)})
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    if post["created_by"] != user_email:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this post")
-
-    await db.posts.delete_one({"_id": ObjectId(id)})
+    await delete_owned(db.posts, id, user_email, "post")
+    await enqueue_cascade(db, "comments", {"post_id": id}, scopes=[scope("comments", id)])
+    cascade_worker.kick()
+    await bump_versions(db, "posts")
+    await invalidate_feed()
     return
-
-@app.get("/health")
-def health():
-    return {"status": "ok"}
\ No newline at end of file